@@ -12,18 +12,31 @@ def create_app(config_name='default'):
     bcrypt.init_app(app)
 
     from app import models
+    from app.utils import (db_engine, http_cache, ingredient_service, recipe_catalog, recipe_images, recipe_scoring,
+                           recipe_search, recommendation_service, request_profiler, user_cache)
+    db_engine.init_app(app)
+    http_cache.init_app(app)
+    ingredient_service.init_app(app)
+    recipe_catalog.init_app(app)
+    recipe_images.init_app(app)
+    recipe_scoring.init_app(app)
+    recipe_search.init_app(app)
+    recommendation_service.init_app(app)
+    request_profiler.init_app(app)
+    user_cache.init_app(app)
 
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
 
     @login_manager.user_loader
     def load_user(user_id):
-        return models.User.query.get(int(user_id))
+        return user_cache.load_user(int(user_id))
 
-    from app.routes import auth, inventory, recipes, shopping
+    from app.routes import api, auth, inventory, recipes, shopping
     app.register_blueprint(auth.bp)
     app.register_blueprint(inventory.bp)
     app.register_blueprint(recipes.bp)
     app.register_blueprint(shopping.bp)
+    app.register_blueprint(api.bp)
 
     return app
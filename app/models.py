@@ -1,5 +1,8 @@
 ﻿from datetime import datetime
 from flask_login import UserMixin
+from sqlalchemy import func, literal_column
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import validates
 from app.extensions import db
 from enum import Enum
 
@@ -23,6 +26,8 @@ class User(db.Model, UserMixin):
     password_hash = db.Column(db.String(255), nullable=False)
     diet_id = db.Column(db.Integer, db.ForeignKey('dietary_stuff.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped on every inventory change; keys per-user recommendation caches
+    inventory_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     shopping_lists = db.relationship('ShoppingList', backref='user', lazy=True, cascade='all, delete-orphan')
     cooking_history = db.relationship('CookingHistory', backref='user', lazy=True, cascade='all, delete-orphan')
@@ -46,9 +51,16 @@ class DietaryStuff(db.Model):
         return f'<DietaryStuff {self.diet_name}>'
 
 
+def normalize_ingredient_name(name):
+    """Canonical form used to compare ingredient names: lowercase, single-spaced."""
+    return ' '.join(name.lower().split()) if name else name
+
+
 class Ingredient(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
+    # Kept in step with ``name``; the identity used for lookups, search and get-or-create
+    normalized_name = db.Column(db.String(100), nullable=False, unique=True, index=True)
     category = db.Column(db.String(50))
     unit = db.Column(db.Enum(UnitEnum), nullable=False)
     carbon_footprint = db.Column(db.Float)
@@ -58,11 +70,20 @@ class Ingredient(db.Model):
     shopping_list_items = db.relationship('ShoppingListItem', backref='ingredient', lazy=True)
     inventory_items = db.relationship('UserInventory', backref='ingredient', lazy=True)
 
+    @validates('name')
+    def _set_normalized_name(self, key, name):
+        self.normalized_name = normalize_ingredient_name(name)
+        return name
+
     def __repr__(self):
         return f'<Ingredient {self.name}>'
 
 
 class ShoppingList(db.Model):
+    __table_args__ = (
+        db.Index('ix_shopping_list_user_created', 'user_id', 'created_at'),
+        db.Index('ix_shopping_list_user_name', 'user_id', 'name'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
@@ -90,6 +111,11 @@ class ShoppingListItem(db.Model):
 
 class UserInventory(db.Model):
     """Tracks ingredients owned by users with quantities and expiry dates"""
+    __table_args__ = (
+        db.Index('ix_user_inventory_user_ingredient_expiry', 'user_id', 'ingredient_id', 'expiry_date'),
+        # Expiry alerts scan every user's lots by date
+        db.Index('ix_user_inventory_expiry', 'expiry_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     ingredient_id = db.Column(db.Integer, db.ForeignKey('ingredient.id'), nullable=False)
@@ -117,14 +143,16 @@ class UserInventory(db.Model):
 
 class Recipe(db.Model):
     id = db.Column(db.Integer, primary_key=True)
+    source_id = db.Column(db.String(100), unique=True, index=True)  # id in the imported feed, e.g. 'recipe_001'
+    content_hash = db.Column(db.String(64))  # sha256 of the imported source record
     name = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
     servings = db.Column(db.Integer, default=4)
     prep_time = db.Column(db.Integer)  # minutes
     cook_time = db.Column(db.Integer)  # minutes
-    difficulty = db.Column(db.String(20))
+    difficulty = db.Column(db.String(20), index=True)
     cuisine = db.Column(db.String(50))
-    diet_id = db.Column(db.Integer, db.ForeignKey('dietary_stuff.id'))  # ['vegan', 'gluten-free', etc.]
+    diet_id = db.Column(db.Integer, db.ForeignKey('dietary_stuff.id'), index=True)  # ['vegan', 'gluten-free', etc.]
     instructions = db.Column(db.JSON)  # List of instruction steps
     nutrition = db.Column(db.JSON)  # Nutrition info dict
     image_url = db.Column(db.String(255))
@@ -145,10 +173,19 @@ class Recipe(db.Model):
             return round(self.rating_sum / self.rating_count, 2)
         return 0
 
-    @property
+    @hybrid_property
     def total_time(self):
         return (self.prep_time or 0) + (self.cook_time or 0)
 
+    @total_time.expression
+    def total_time(cls):
+        return func.coalesce(cls.prep_time, literal_column('0')) + func.coalesce(cls.cook_time, literal_column('0'))
+
+
+# Expression index matching Recipe.total_time, for search filters. The zeros are
+# literals so that queries compile to the same expression and can use the index.
+db.Index('ix_recipe_total_time', Recipe.total_time)
+
 
 class RecipeIngredient(db.Model):
     recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id'), primary_key=True)
@@ -167,6 +204,9 @@ class RecipeIngredient(db.Model):
 
 # --- Update CookingHistory to reference Recipe ---
 class CookingHistory(db.Model):
+    __table_args__ = (
+        db.Index('ix_cooking_history_user_date', 'user_id', 'cooking_date'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id'), nullable=True)
@@ -180,3 +220,28 @@ class CookingHistory(db.Model):
     def __repr__(self):
         return f'<CookingHistory User:{self.user_id} Recipe:{self.recipe_id}>'
 
+
+class CatalogVersion(db.Model):
+    """Single-row counter bumped whenever the recipe catalog tables change"""
+    __tablename__ = 'catalog_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CatalogVersion {self.version}>'
+
+
+class ExpiryNotification(db.Model):
+    """Expiry date last alerted for an inventory lot; the lot is alerted again only if it changes"""
+    __tablename__ = 'expiry_notification'
+    id = db.Column(db.Integer, primary_key=True)
+    inventory_id = db.Column(db.Integer, db.ForeignKey('user_inventory.id', ondelete='CASCADE'), nullable=False,
+                             unique=True)
+    # Guards against a new lot reusing the id of a deleted one
+    ingredient_id = db.Column(db.Integer, nullable=False)
+    expiry_date = db.Column(db.Date, nullable=False)
+    notified_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ExpiryNotification Inventory:{self.inventory_id} {self.expiry_date}>'
@@ -0,0 +1,198 @@
+import base64
+import json
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context, current_app
+from flask_login import current_user
+from app.utils.inventory_service import allocate_fefo_sequence, load_inventory_lots
+from app.utils.recipe_catalog import get_catalog
+from app.utils.recipe_scoring import SORT_MODES
+from app.utils.recommendation_service import get_recommendations
+
+bp = Blueprint('api', __name__, url_prefix='/api')
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def encode_cursor(offset, sort, diet_id, inventory_version, catalog_version):
+    payload = json.dumps([offset, sort, diet_id, inventory_version, catalog_version], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the cursor fields, or None if the cursor is malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        offset, sort, diet_id, inventory_version, catalog_version = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(offset, int) or offset < 0:
+        return None
+    return offset, sort, diet_id, inventory_version, catalog_version
+
+
+def api_error(message, status):
+    response = jsonify({'error': message})
+    response.status_code = status
+    return response
+
+
+@bp.before_request
+def require_login():
+    # API clients get a 401 instead of the HTML login redirect
+    if not current_user.is_authenticated:
+        return api_error('Authentication required.', 401)
+
+
+@bp.route('/recipes/recommend')
+def recommend():
+    """Ranked recommendations as a streamed JSON document or NDJSON lines.
+
+    Query parameters: ``sort`` and ``diet`` as on /recipes/recommend, ``limit``
+    (page size) and ``cursor`` (opaque, from the previous page's
+    ``next_cursor``). NDJSON is returned for ``format=ndjson`` or an
+    ``Accept: application/x-ndjson`` header; the cursor then travels in the
+    ``X-Next-Cursor`` header.
+    """
+    sort = request.args.get('sort', 'match')
+    if sort not in SORT_MODES:
+        return api_error(f"Unknown sort '{sort}'. Use one of: {', '.join(SORT_MODES)}.", 400)
+    diet_id = request.args.get('diet', type=int)
+    limit = request.args.get('limit', type=int) or current_app.config['API_RECOMMEND_LIMIT']
+    limit = min(max(limit, 1), current_app.config['API_RECOMMEND_MAX_LIMIT'])
+
+    offset = 0
+    cursor = request.args.get('cursor')
+    if cursor:
+        fields = decode_cursor(cursor)
+        if fields is None:
+            return api_error('Malformed cursor.', 400)
+        offset, cursor_sort, cursor_diet, _, _ = fields
+        if (cursor_sort, cursor_diet) != (sort, diet_id):
+            return api_error('Cursor belongs to a different sort or diet filter.', 400)
+
+    result = get_recommendations(current_user, sort, diet_id=diet_id, limit=offset + limit)
+    if cursor and fields[3:] != (current_user.inventory_version, result.catalog.version):
+        return api_error('Cursor is stale: the inventory or catalog changed. Restart without a cursor.', 409)
+
+    stop = offset + limit
+    next_cursor = None
+    if stop < result.total:
+        next_cursor = encode_cursor(stop, sort, diet_id, current_user.inventory_version, result.catalog.version)
+
+    def items():
+        for pos in range(offset, min(stop, len(result.order))):
+            idx = result.order[pos]
+            recipe = result.catalog.recipes[idx]
+            yield {
+                'id': recipe.id,
+                'name': recipe.name,
+                'rank': pos + 1,
+                'score': result.scores[pos],
+                'insufficient_count': result.insufficient_counts[pos],
+                'missing': result.missing_items(idx),
+            }
+
+    ndjson = request.args.get('format') == 'ndjson' or \
+        request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+    if ndjson:
+        def generate():
+            for item in items():
+                yield json.dumps(item, separators=(',', ':')) + '\n'
+        mimetype = NDJSON_MIMETYPE
+    else:
+        def generate():
+            head = {'sort': sort, 'diet': diet_id, 'total': result.total, 'next_cursor': next_cursor}
+            yield json.dumps(head, separators=(',', ':'))[:-1] + ',"results":['
+            for n, item in enumerate(items()):
+                yield (',' if n else '') + json.dumps(item, separators=(',', ':'))
+            yield ']}'
+        mimetype = 'application/json'
+
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['X-Total-Count'] = str(result.total)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+
+def parse_cook_check_items(payload):
+    """Return [(recipe_id, servings or None)] from a cook-check body, or None if malformed."""
+    items = payload.get('recipes') if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        return None
+    parsed = []
+    for item in items:
+        if isinstance(item, int) and not isinstance(item, bool):
+            parsed.append((item, None))
+            continue
+        if not isinstance(item, dict) or not isinstance(item.get('id'), int):
+            return None
+        servings = item.get('servings')
+        if servings is not None and (not isinstance(servings, (int, float)) or servings <= 0):
+            return None
+        parsed.append((item['id'], servings))
+    return parsed
+
+
+@bp.route('/recipes/cook-check', methods=['POST'])
+def cook_check():
+    """Feasibility of cooking several recipes in a row from the current inventory.
+
+    The body is a JSON list (or ``{"recipes": [...]}``) of recipe ids or
+    ``{"id": ..., "servings": ...}`` objects. Recipes are allocated in the
+    given order from one inventory load, first-expiring lots first as in
+    cook(), so later recipes only see what earlier ones left. Quantities are
+    scaled by ``servings`` when the recipe states its own servings.
+    """
+    items = parse_cook_check_items(request.get_json(silent=True))
+    if items is None:
+        return api_error('Expected a JSON list of recipe ids or {"id": ..., "servings": ...} objects.', 400)
+    max_recipes = current_app.config['API_COOK_CHECK_MAX_RECIPES']
+    if len(items) > max_recipes:
+        return api_error(f'At most {max_recipes} recipes can be checked at once.', 400)
+
+    catalog = get_catalog()
+    unknown = [recipe_id for recipe_id, _ in items if catalog.index_of(recipe_id) is None]
+    if unknown:
+        return api_error(f"Unknown recipe id(s): {', '.join(map(str, unknown))}.", 404)
+
+    needs = []
+    for recipe_id, servings in items:
+        idx = catalog.index_of(recipe_id)
+        base = catalog.recipes[idx].servings
+        factor = servings / base if servings and base else 1
+        needed = {}
+        for ingredient_id, qty in catalog.requirements(idx):
+            needed[ingredient_id] = needed.get(ingredient_id, 0) + qty * factor
+        needs.append(needed)
+
+    ingredient_ids = set().union(*needs) if needs else set()
+    lots = load_inventory_lots(current_user.id, ingredient_ids, lock=False)
+    allocations = allocate_fefo_sequence(lots, needs)
+
+    def missing_list(shortfall):
+        return [
+            {'id': ingredient_id, 'name': catalog.ingredients[ingredient_id].name,
+             'missing': qty, 'unit': catalog.ingredients[ingredient_id].unit}
+            for ingredient_id, qty in shortfall.items()
+        ]
+
+    results = []
+    total_shortfall = {}
+    for (recipe_id, servings), allocation in zip(items, allocations):
+        recipe = catalog.recipes[catalog.index_of(recipe_id)]
+        for ingredient_id, qty in allocation.shortfall.items():
+            total_shortfall[ingredient_id] = total_shortfall.get(ingredient_id, 0) + qty
+        results.append({
+            'id': recipe_id,
+            'name': recipe.name,
+            'servings': servings or recipe.servings,
+            'had_all': not allocation.shortfall,
+            'missing': missing_list(allocation.shortfall),
+        })
+    return jsonify({
+        'had_all': not total_shortfall,
+        'recipes': results,
+        'missing': missing_list(total_shortfall),
+    })
@@ -1,8 +1,9 @@
 ﻿from flask import Blueprint, render_template, request, redirect, url_for, flash
-from flask_login import login_user, logout_user, login_required
+from flask_login import current_user, login_user, logout_user, login_required
 from app.extensions import db, bcrypt
 from app.models import User
 from app.forms import LoginForm, RegisterForm
+from app.utils.user_cache import forget_user
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -41,6 +42,7 @@ def register():
 @bp.route('/logout')
 @login_required
 def logout():
+    forget_user(current_user.id)
     logout_user()
     flash('You have been logged out.', 'success')
     return redirect(url_for('auth.login'))
@@ -1,14 +1,15 @@
 from datetime import datetime
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 from flask_login import login_required, current_user
 from app.forms import IngredientForm
 from app.utils.inventory_service import (
-    get_user_inventory,
+    search_inventory,
     get_expiring_items,
     add_inventory_item,
     find_or_create_ingredient,
     delete_inventory_item,
 )
+from app.utils.unit_service import UnitConversionError
 
 bp = Blueprint('inventory', __name__, url_prefix='/inventory')
 
@@ -16,11 +17,12 @@ bp = Blueprint('inventory', __name__, url_prefix='/inventory')
 @login_required
 def index():
     q = request.args.get('q', '').strip().lower()
-    items = get_user_inventory(current_user.id)
-    if q:
-        items = [i for i in items if q in i.ingredient.name.lower()]
+    after = request.args.get('after')
+    page = search_inventory(current_user.id, q=q, after=after, limit=current_app.config['INVENTORY_PER_PAGE'])
+    # Every expiring item, whatever the search or page
     expiring = get_expiring_items(current_user.id, days=7)
-    return render_template('inventory/index.html', items=items, expiring=expiring, q=q)
+    return render_template('inventory/index.html', items=page.items, expiring=expiring, q=q,
+                           next_cursor=page.next_cursor, after=after)
 
 @bp.route('/add', methods=['GET', 'POST'])
 @login_required
@@ -32,13 +34,18 @@ def add():
             name=form.name.data,
             default_unit=form.unit.data
         )
-        add_inventory_item(
-            user_id=current_user.id,
-            ingredient_id=ingredient.id,
-            quantity=float(form.quantity.data),
-            unit=form.unit.data,
-            expiry_date=form.expiry_date.data,
-        )
+        try:
+            add_inventory_item(
+                user_id=current_user.id,
+                ingredient_id=ingredient.id,
+                quantity=float(form.quantity.data),
+                unit=form.unit.data,
+                expiry_date=form.expiry_date.data,
+            )
+        except UnitConversionError:
+            flash(f'{ingredient.name} is tracked in {ingredient.unit.value}; please enter the quantity '
+                  f'in a unit that converts to it.', 'error')
+            return render_template('inventory/add.html', form=form)
         flash('Inventory item added successfully!', 'success')
         return redirect(url_for('inventory.index'))
 
@@ -1,12 +1,20 @@
-﻿from flask import Blueprint, render_template, request, redirect, url_for, flash
+﻿from flask import Blueprint, render_template, request, redirect, url_for, flash, abort, current_app
 from flask_login import login_required, current_user
-from app.models import Recipe, RecipeIngredient, UserInventory, ShoppingList, ShoppingListItem
+from app.models import Recipe
 from app.extensions import db
-from app.utils.unit_service import convert_recipe_to_ingredient_unit
-from sqlalchemy import func
+from app.utils.recipe_catalog import get_catalog
+from app.utils.http_cache import inventory_etag
+from app.utils.inventory_service import get_inventory_snapshot, get_inventory_lots, consume_inventory, InventoryConflict
+from app.utils.meal_planner import plan_meals
+from app.utils.recipe_search import search_recipes
+from app.utils.shopping_service import get_or_create_list, add_items_to_list
+from app.utils.recommendation_service import get_recommendations
 
 bp = Blueprint('recipes', __name__, url_prefix='/recipes')
 
+# Attempts at deducting inventory for one cook before giving up on concurrent changes
+COOK_ATTEMPTS = 3
+
 
 @bp.route('/')
 @login_required
@@ -14,55 +22,22 @@ def index():
     return recommend()
 
 
-def get_user_inventory_ids(user_id):
-    return set(i.ingredient_id for i in UserInventory.query.filter_by(user_id=user_id).all())
-
 def get_user_inventory_map(user_id):
     """Get a map of ingredient_id -> total available quantity"""
-    inventory = UserInventory.query.filter_by(user_id=user_id).all()
-    inventory_map = {}
-    for item in inventory:
-        if item.ingredient_id in inventory_map:
-            inventory_map[item.ingredient_id] += item.quantity
-        else:
-            inventory_map[item.ingredient_id] = item.quantity
-    return inventory_map
+    return get_inventory_snapshot(user_id).quantities
 
-def get_earliest_expiry_for_recipe(recipe, user_id):
-    """Get the earliest expiry date for ingredients needed in this recipe"""
-    from datetime import date, timedelta
-    earliest = None
-    
-    for ri in recipe.ingredients:
-        inventory_items = UserInventory.query.filter_by(
-            user_id=user_id,
-            ingredient_id=ri.ingredient_id
-        ).all()
-        
-        for item in inventory_items:
-            if item.expiry_date:
-                if earliest is None or item.expiry_date < earliest:
-                    earliest = item.expiry_date
-    
-    if earliest is None:
-        return date.today() + timedelta(days=9999)
-    
-    return earliest
-
-def get_ingredient_status(recipe, user_inventory_map):
+def get_ingredient_status(catalog, idx, user_inventory_map):
     """Check each ingredient and return status with availability details"""
     ingredient_details = []
-    for ri in recipe.ingredients:
-        available_qty = user_inventory_map.get(ri.ingredient_id, 0)
-        ing_unit_value = ri.ingredient.unit.value if hasattr(ri.ingredient.unit, 'value') else ri.ingredient.unit
-        converted_needed = convert_recipe_to_ingredient_unit(ri.quantity, ri.unit, ing_unit_value)
-        needed_qty = converted_needed if converted_needed is not None else ri.quantity
+    for ingredient_id, needed_qty in catalog.requirements(idx):
+        ingredient = catalog.ingredients[ingredient_id]
+        available_qty = user_inventory_map.get(ingredient_id, 0)
         
         status = {
-            'name': ri.ingredient.name,
+            'name': ingredient.name,
             'needed': needed_qty,
             'available': available_qty,
-            'unit_str': ing_unit_value,
+            'unit_str': ingredient.unit,
             'is_sufficient': available_qty >= needed_qty,
             'missing': max(0, needed_qty - available_qty)
         }
@@ -70,131 +45,123 @@ def get_ingredient_status(recipe, user_inventory_map):
     
     return ingredient_details
 
-def get_missing_ingredients(recipe, user_ingredient_ids):
-    missing = []
-    for ri in recipe.ingredients:
-        if ri.ingredient_id not in user_ingredient_ids:
-            missing.append(ri.ingredient.name)
-    return missing
-
-def get_missing_count(recipe, user_ingredient_ids):
-    return sum(1 for ri in recipe.ingredients if ri.ingredient_id not in user_ingredient_ids)
+def get_catalog_index(recipe_id):
+    """The catalog and the recipe's index in it; 404 if the recipe does not exist."""
+    catalog = get_catalog()
+    idx = catalog.index_of(recipe_id)
+    if idx is None:
+        # Added since this process last checked the catalog version (e.g. by an import)
+        catalog = get_catalog(fresh=True)
+        idx = catalog.index_of(recipe_id)
+        if idx is None:
+            abort(404)
+    return catalog, idx
 
 @bp.route('/recommend')
 @login_required
+@inventory_etag
 def recommend():
     sort = request.args.get('sort', 'match')
-    recipes = Recipe.query.all()
-    user_inventory_map = get_user_inventory_map(current_user.id)
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = request.args.get('per_page', type=int) or request.args.get('limit', type=int) \
+        or current_app.config['RECOMMEND_PER_PAGE']
+    per_page = min(max(per_page, 1), current_app.config['RECOMMEND_MAX_PER_PAGE'])
+
+    diet_id = request.args.get('diet', type=int)
+
+    # Only the recipes up to the requested page are ranked, and only that page is built
+    result = get_recommendations(current_user, sort, diet_id=diet_id, limit=page * per_page)
     recs = []
-    for recipe in recipes:
-        ingredient_status = get_ingredient_status(recipe, user_inventory_map)
-        insufficient_count = sum(1 for ing in ingredient_status if not ing['is_sufficient'])
-        earliest_expiry = get_earliest_expiry_for_recipe(recipe, current_user.id)
+    for idx, recipe, insufficient_count in result.entries((page - 1) * per_page, page * per_page):
         recs.append({
-            'recipe': recipe, 
+            'recipe': recipe,
             'insufficient_count': insufficient_count,
-            'ingredient_status': ingredient_status,
-            'earliest_expiry': earliest_expiry
+            'ingredient_status': get_ingredient_status(result.catalog, idx, result.quantities),
         })
-    if sort == 'match':
-        recs.sort(key=lambda r: r['insufficient_count'])
-    elif sort == 'rating':
-        recs.sort(key=lambda r: r['recipe'].average_rating, reverse=True)
-    elif sort == 'expiry':
-        recs.sort(key=lambda r: r['earliest_expiry'])
-    elif sort == 'weighted':
-        from datetime import date
-        max_insufficient = max((r['insufficient_count'] for r in recs), default=1)
-        max_expiry_days = max(((r['earliest_expiry'] - date.today()).days for r in recs), default=1)
-        max_rating = max((r['recipe'].average_rating for r in recs), default=5.0)
-        
-        for r in recs:
-            insufficient_score = r['insufficient_count'] / max_insufficient if max_insufficient > 0 else 0
-            expiry_days = (r['earliest_expiry'] - date.today()).days
-            expiry_score = expiry_days / max_expiry_days if max_expiry_days > 0 else 0
-            rating_score = 1 - (r['recipe'].average_rating / max_rating) if max_rating > 0 else 0
-            
-            r['weighted_score'] = (0.5 * insufficient_score) + (0.3 * expiry_score) + (0.2 * rating_score)
-        
-        recs.sort(key=lambda r: r['weighted_score'])
-    elif sort == 'all':
-        recs.sort(key=lambda r: r['recipe'].name.lower())
-    return render_template('recipes/recommend.html', recipes=recs, sort=sort)
+    pages = max((result.total + per_page - 1) // per_page, 1)
+    return render_template('recipes/recommend.html', recipes=recs, sort=sort, diet_id=diet_id,
+                           diets=result.catalog.diets, page=page, pages=pages, per_page=per_page,
+                           total=result.total)
+
+@bp.route('/search')
+@login_required
+def search():
+    q = request.args.get('q', '').strip()
+    max_time = request.args.get('max_time', type=int)
+    difficulty = request.args.get('difficulty') or None
+    diet_id = request.args.get('diet', type=int)
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', type=int) or current_app.config['SEARCH_PER_PAGE'], 1),
+                   current_app.config['RECOMMEND_MAX_PER_PAGE'])
+
+    results = search_recipes(q, max_time=max_time, difficulty=difficulty, diet_id=diet_id,
+                             page=page, per_page=per_page)
+    pages = max((results.total + per_page - 1) // per_page, 1)
+    return render_template('recipes/search.html', recipes=results.recipes, total=results.total, q=q,
+                           max_time=max_time, difficulty=difficulty, diet_id=diet_id,
+                           diets=get_catalog().diets, page=page, pages=pages, per_page=per_page)
+
+@bp.route('/plan')
+@login_required
+def plan():
+    days = request.args.get('days', 7, type=int)
+    days = min(max(days, 1), current_app.config['MEAL_PLAN_MAX_DAYS'])
+    diet_id = request.args.get('diet', type=int)
+    catalog = get_catalog()
+    meal_plan = plan_meals(
+        catalog,
+        get_inventory_lots(current_user.id),
+        days,
+        current_app.config['MEAL_PLAN_TIME_BUDGET'],
+        diet_id=diet_id,
+        pool_size=current_app.config['MEAL_PLAN_CANDIDATES'],
+    )
+    return render_template('recipes/plan.html', plan=meal_plan, days=days, diet_id=diet_id,
+                           diets=catalog.diets, max_days=current_app.config['MEAL_PLAN_MAX_DAYS'])
 
 @bp.route('/<int:recipe_id>')
 @login_required
+@inventory_etag
 def detail(recipe_id):
     recipe = Recipe.query.get_or_404(recipe_id)
+    catalog, idx = get_catalog_index(recipe.id)
     user_inventory_map = get_user_inventory_map(current_user.id)
-    ingredient_status = get_ingredient_status(recipe, user_inventory_map)
+    ingredient_status = get_ingredient_status(catalog, idx, user_inventory_map)
     return render_template('recipes/detail.html', recipe=recipe, ingredient_status=ingredient_status)
 
 
 @bp.route('/<int:recipe_id>/cook', methods=['POST'])
 @login_required
 def cook(recipe_id):
-    recipe = Recipe.query.get_or_404(recipe_id)
+    catalog, idx = get_catalog_index(recipe_id)
+    recipe = catalog.recipes[idx]
     user_id = current_user.id
     mode = request.args.get('add_to_list', 'none')
 
-    shopping_list = None
-    if mode in ('replace', 'missing'):
-        list_name = recipe.name
-        shopping_list = ShoppingList.query.filter_by(user_id=user_id, name=list_name).first()
-        if not shopping_list:
-            shopping_list = ShoppingList(user_id=user_id, name=list_name)
-            db.session.add(shopping_list)
-            db.session.flush()
-
-    from sqlalchemy import asc
-    added_items = []
-    had_all = True
-    for ri in recipe.ingredients:
-        ing_unit_value = ri.ingredient.unit.value if hasattr(ri.ingredient.unit, 'value') else ri.ingredient.unit
-        converted_needed = convert_recipe_to_ingredient_unit(ri.quantity or 0, ri.unit, ing_unit_value)
-        needed = converted_needed if converted_needed is not None else (ri.quantity or 0)
-        if needed <= 0:
-            continue
-
-        inv_items = (
-            UserInventory.query
-            .filter_by(user_id=user_id, ingredient_id=ri.ingredient_id)
-            .order_by(asc(UserInventory.expiry_date))
-            .all()
-        )
-
-        remaining = needed
-        for inv in inv_items:
-            if remaining <= 0:
-                break
-            take = min(inv.quantity, remaining)
-            inv.quantity -= take
-            remaining -= take
-            if inv.quantity <= 0:
-                db.session.delete(inv)
-
-        if remaining > 0:
-            had_all = False
-            if mode == 'missing' and shopping_list is not None:
-                sli = ShoppingListItem.query.filter_by(shopping_list_id=shopping_list.id, ingredient_id=ri.ingredient_id).first()
-                if sli:
-                    sli.quantity += remaining
-                else:
-                    sli = ShoppingListItem(shopping_list_id=shopping_list.id, ingredient_id=ri.ingredient_id, quantity=remaining)
-                    db.session.add(sli)
-                added_items.append((ri.ingredient.name, remaining, ri.unit.value if hasattr(ri.unit, 'value') else ri.unit))
-        else:
-            if mode == 'replace' and shopping_list is not None and needed > 0:
-                sli = ShoppingListItem.query.filter_by(shopping_list_id=shopping_list.id, ingredient_id=ri.ingredient_id).first()
-                if sli:
-                    sli.quantity += needed
-                else:
-                    sli = ShoppingListItem(shopping_list_id=shopping_list.id, ingredient_id=ri.ingredient_id, quantity=needed)
-                    db.session.add(sli)
-                added_items.append((ri.ingredient.name, needed, ri.unit.value if hasattr(ri.unit, 'value') else ri.unit))
-
-    db.session.commit()
+    needed = {}
+    for ingredient_id, qty in catalog.requirements(idx):
+        needed[ingredient_id] = needed.get(ingredient_id, 0) + qty
+
+    # Deduct all lots in one pass; a concurrent change to the same lots rolls back and retries
+    for attempt in range(COOK_ATTEMPTS):
+        try:
+            allocation = consume_inventory(user_id, needed)
+            shopping_list = None
+            added_items = {}
+            if mode == 'missing':
+                added_items = allocation.shortfall
+            elif mode == 'replace':
+                added_items = {i: qty for i, qty in needed.items() if qty > 0 and i not in allocation.shortfall}
+            if added_items:
+                shopping_list = get_or_create_list(user_id, recipe.name)
+                add_items_to_list(shopping_list.id, added_items)
+            db.session.commit()
+            break
+        except InventoryConflict:
+            db.session.rollback()
+    else:
+        flash(f"Your inventory changed while cooking '{recipe.name}'. Please try again.", 'error')
+        return redirect(url_for('recipes.detail', recipe_id=recipe.id))
 
     if added_items:
         list_name = shopping_list.name if shopping_list else recipe.name
@@ -212,10 +179,11 @@ def cook(recipe_id):
 
 @bp.route('/<int:recipe_id>/cook-check', methods=['GET'])
 @login_required
+@inventory_etag
 def cook_check(recipe_id):
-    recipe = Recipe.query.get_or_404(recipe_id)
+    catalog, idx = get_catalog_index(recipe_id)
     user_inventory_map = get_user_inventory_map(current_user.id)
-    status = get_ingredient_status(recipe, user_inventory_map)
+    status = get_ingredient_status(catalog, idx, user_inventory_map)
     missing = [
         {
             'name': s['name'],
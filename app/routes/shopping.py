@@ -2,6 +2,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
 from app import db
+from app.utils.ingredient_service import get_or_create_ingredient
+from app.utils.shopping_service import add_items_to_list, consolidated_items, get_user_lists
 from app.utils.unit_service import convert_quantity
 from app.models import ShoppingList, ShoppingListItem, Ingredient, UnitEnum
 
@@ -10,13 +12,15 @@ bp = Blueprint('shopping', __name__, url_prefix='/shopping')
 @bp.route('/')
 @login_required
 def index():
-    shopping_lists = (
-        ShoppingList.query
-        .filter_by(user_id=current_user.id)
-        .order_by(ShoppingList.created_at.desc())
-        .all()
-        )
+    shopping_lists = get_user_lists(current_user.id)
     return render_template('shopping/list.html', shopping_lists=shopping_lists)
+
+@bp.route('/consolidated')
+@login_required
+def consolidated():
+    """Everything still to buy, summed per ingredient across all lists."""
+    items = consolidated_items(current_user.id)
+    return render_template('shopping/consolidated.html', items=items)
 #újlista
 @bp.route('/create', methods=['POST'])
 @login_required
@@ -59,22 +63,16 @@ def add_item(list_id):
         flash('All fields are required.', 'error')
         return redirect(url_for('shopping.index'))
     #csekkoljuk van é már íly hozzátevő
-    ingredient = Ingredient.query.filter_by(name=ingredient_name.lower()).first()
-    if not ingredient:
-        ingredient = Ingredient(name=ingredient_name.lower(), unit=unit)
-        db.session.add(ingredient)
-        db.session.commit()
+    ingredient = get_or_create_ingredient(ingredient_name, unit)
 
     # Normalize entered quantity to ingredient's canonical unit for consistency with inventory
     ing_unit_value = ingredient.unit.value if hasattr(ingredient.unit, 'value') else ingredient.unit
-    final_qty = convert_quantity(quantity, unit_str, ing_unit_value) or quantity
-    new_item = ShoppingListItem(
-        shopping_list_id=shopping_list.id,
-        ingredient_id=ingredient.id,
-        quantity=final_qty,
-        is_purchased = False
-    )
-    db.session.add(new_item)
+    final_qty = convert_quantity(quantity, unit_str, ing_unit_value, ingredient.name)
+    if final_qty is None:
+        flash(f'{ingredient.name} is tracked in {ing_unit_value}; {unit_str} cannot be converted to it.', 'error')
+        return redirect(url_for('shopping.index'))
+    # Adding an ingredient that is already on the list increases its quantity
+    add_items_to_list(shopping_list.id, {ingredient.id: final_qty})
     db.session.commit()
     flash(f'Added {ingredient_name} to {shopping_list.name}.', 'success')
     return redirect(url_for('shopping.index'))
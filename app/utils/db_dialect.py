@@ -0,0 +1,15 @@
+"""Helpers for backend-specific SQL."""
+from typing import Callable, Optional
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+# Dialects whose INSERT supports ON CONFLICT ... DO UPDATE and RETURNING
+_UPSERT_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+def upsert_insert(bind) -> Optional[Callable]:
+    """The dialect's ``insert`` construct with ``on_conflict_*`` support, or None if it has none."""
+    return _UPSERT_INSERTS.get(bind.dialect.name)
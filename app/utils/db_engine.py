@@ -0,0 +1,36 @@
+"""Per-connection tuning for SQLite.
+
+Every new DBAPI connection gets the ``SQLITE_PRAGMAS`` from the config
+(journal mode, busy timeout, synchronous level, cache size, ...). Pool and
+timeout settings for server databases are plain engine options, see
+``production_engine_options`` in ``config.py``.
+"""
+import sqlite3
+
+from sqlalchemy import event
+
+from app.extensions import db
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas: dict) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+    finally:
+        cursor.close()
+
+
+def init_app(app) -> None:
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    if not pragmas:
+        return
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        if isinstance(dbapi_connection, sqlite3.Connection):
+            apply_sqlite_pragmas(dbapi_connection, pragmas)
@@ -0,0 +1,281 @@
+"""Batched expiry alerts: one digest per user of the pantry lots about to expire.
+
+``notify_expiring`` (run daily by ``notify_expiring.py``) finds the lots of
+every user that expire within ``EXPIRY_NOTIFY_DAYS`` (or expired at most
+``EXPIRY_NOTIFY_LOOKBACK_DAYS`` ago, in case a run was missed) with one
+query over the ``expiry_date`` index, ordered by user. It hands each user's
+digest to a notifier. A notifier is any object with ``send(digest)`` and
+``close()``: ``FileNotifier`` appends JSON lines for development, and
+``SmtpNotifier`` sends mail, e.g. to a local debugging server.
+
+Runs are incremental. Each alerted lot's expiry date is recorded in
+``ExpiryNotification``, and the query skips lots whose recorded date is
+unchanged, so a lot is alerted once and again only when its date is edited.
+Records are written after the digest was sent, every ``batch_size`` users.
+A failed send is retried on the next run, and a crash can at worst repeat
+the alerts of one batch.
+"""
+import json
+import logging
+import os
+import smtplib
+import sys
+from datetime import date, datetime
+from email.message import EmailMessage
+from itertools import groupby
+from typing import Iterator, List, NamedTuple, Optional
+
+from flask import current_app
+from sqlalchemy import delete, exists, insert, or_, select
+
+from app.extensions import db
+from app.models import ExpiryNotification, Ingredient, User, UserInventory
+from app.utils.db_dialect import upsert_insert
+
+logger = logging.getLogger(__name__)
+
+NOTIFIERS = ('file', 'smtp')
+
+
+class ExpiringLot(NamedTuple):
+    inventory_id: int
+    ingredient_id: int
+    name: str
+    quantity: float
+    unit: str
+    expiry_date: date
+
+
+class ExpiryDigest:
+    """The lots of one user to alert about, soonest expiry first."""
+
+    def __init__(self, user_id: int, email: str, lots: List[ExpiringLot], today: date):
+        self.user_id = user_id
+        self.email = email
+        self.lots = lots
+        self.today = today
+
+    def subject(self) -> str:
+        if len(self.lots) == 1:
+            return f'{self.lots[0].name} in your pantry expires soon'
+        return f'{len(self.lots)} items in your pantry expire soon'
+
+    def _when(self, expiry_date: date) -> str:
+        days = (expiry_date - self.today).days
+        if days < 0:
+            return f"expired {-days} day{'s' if days != -1 else ''} ago"
+        if days == 0:
+            return 'expires today'
+        if days == 1:
+            return 'expires tomorrow'
+        return f'expires in {days} days'
+
+    def text(self) -> str:
+        lines = ['These ingredients in your EcoCook pantry are about to expire:', '']
+        lines += [f'- {lot.name}: {lot.quantity:g} {lot.unit}, {self._when(lot.expiry_date)} ({lot.expiry_date})'
+                  for lot in self.lots]
+        lines += ['', 'Open "Recommended recipes" sorted by expiry to use them up.']
+        return '\n'.join(lines)
+
+    def as_dict(self) -> dict:
+        return {
+            'user_id': self.user_id, 'email': self.email, 'subject': self.subject(),
+            'lots': [{**lot._asdict(), 'expiry_date': lot.expiry_date.isoformat()} for lot in self.lots],
+        }
+
+
+class FileNotifier:
+    """Appends each digest to ``path`` as one JSON line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def send(self, digest: ExpiryDigest) -> None:
+        if self._file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(digest.as_dict()) + '\n')
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class SmtpNotifier:
+    """Mails each digest, reusing one SMTP connection for the run.
+
+    The defaults (localhost:1025, no TLS or login) reach a local debugging
+    server such as ``python -m aiosmtpd -n``, which prints the messages.
+    """
+
+    def __init__(self, host: str, port: int, sender: str, username: Optional[str] = None,
+                 password: Optional[str] = None, use_tls: bool = False, timeout: float = 10):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self._smtp = None
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            smtp.starttls()
+        if self.username:
+            smtp.login(self.username, self.password or '')
+        return smtp
+
+    def send(self, digest: ExpiryDigest) -> None:
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = digest.email
+        message['Subject'] = digest.subject()
+        message.set_content(digest.text())
+        if self._smtp is None:
+            self._smtp = self._connect()
+        try:
+            self._smtp.send_message(message)
+        except OSError:
+            # The connection may be unusable; the next digest reconnects
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except OSError:
+                pass
+            self._smtp = None
+
+
+class PrintNotifier:
+    """Writes digests to a stream (stdout by default), for dry runs."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def send(self, digest: ExpiryDigest) -> None:
+        self.stream.write(f'To: {digest.email}\nSubject: {digest.subject()}\n\n{digest.text()}\n\n')
+
+    def close(self) -> None:
+        pass
+
+
+def create_notifier(config, name: Optional[str] = None):
+    """The notifier named by ``name`` or ``EXPIRY_NOTIFIER``, configured from ``config``."""
+    name = name or config['EXPIRY_NOTIFIER']
+    if name == 'file':
+        return FileNotifier(config['EXPIRY_NOTIFY_FILE'])
+    if name == 'smtp':
+        return SmtpNotifier(config['MAIL_SERVER'], config['MAIL_PORT'], config['MAIL_SENDER'],
+                            config.get('MAIL_USERNAME'), config.get('MAIL_PASSWORD'), config.get('MAIL_USE_TLS', False))
+    raise ValueError(f'Unknown expiry notifier {name!r}; expected one of {", ".join(NOTIFIERS)}')
+
+
+class NotifyStats:
+    def __init__(self):
+        self.users = 0
+        self.lots = 0
+        self.failed = 0
+        self.pruned = 0
+
+    def __str__(self):
+        return (f'{self.lots} lots alerted to {self.users} users, {self.failed} failed sends, '
+                f'{self.pruned} records of removed lots pruned')
+
+
+def find_expiring(today: date, days: int, lookback_days: int) -> Iterator[ExpiryDigest]:
+    """Digests of the lots in the window that were not alerted with their current expiry date."""
+    notified = ExpiryNotification
+    rows = db.session.execute(
+        select(UserInventory.id, UserInventory.user_id, User.email, UserInventory.ingredient_id, Ingredient.name,
+               Ingredient.unit, UserInventory.quantity, UserInventory.expiry_date)
+        .join(User, User.id == UserInventory.user_id)
+        .join(Ingredient, Ingredient.id == UserInventory.ingredient_id)
+        .outerjoin(notified, notified.inventory_id == UserInventory.id)
+        .where(
+            UserInventory.expiry_date.between(date.fromordinal(today.toordinal() - lookback_days),
+                                              date.fromordinal(today.toordinal() + days)),
+            or_(notified.id.is_(None), notified.expiry_date != UserInventory.expiry_date,
+                notified.ingredient_id != UserInventory.ingredient_id),
+        )
+        .order_by(UserInventory.user_id, UserInventory.expiry_date, UserInventory.id)
+    ).all()
+    for (user_id, email), group in groupby(rows, key=lambda row: (row[1], row[2])):
+        lots = [ExpiringLot(lot_id, ingredient_id, name, quantity, getattr(unit, 'value', unit), expiry_date)
+                for lot_id, _, _, ingredient_id, name, unit, quantity, expiry_date in group]
+        yield ExpiryDigest(user_id, email, lots, today)
+
+
+def prune_notifications() -> int:
+    """Delete the records of lots that no longer exist (consumed or removed); return how many."""
+    table = ExpiryNotification.__table__
+    lots = UserInventory.__table__
+    result = db.session.execute(delete(table).where(~exists().where(lots.c.id == table.c.inventory_id)))
+    return result.rowcount or 0
+
+
+def record_notifications(lots: List[ExpiringLot], now: Optional[datetime] = None) -> None:
+    if not lots:
+        return
+    now = now or datetime.utcnow()
+    table = ExpiryNotification.__table__
+    rows = [{'inventory_id': lot.inventory_id, 'ingredient_id': lot.ingredient_id, 'expiry_date': lot.expiry_date,
+             'notified_at': now} for lot in lots]
+    upsert = upsert_insert(db.session.get_bind())
+    if upsert is not None:
+        stmt = upsert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.inventory_id],
+            set_={column: stmt.excluded[column] for column in ('ingredient_id', 'expiry_date', 'notified_at')},
+        )
+        db.session.execute(stmt, rows)
+    else:
+        db.session.execute(delete(table).where(table.c.inventory_id.in_([lot.inventory_id for lot in lots])))
+        db.session.execute(insert(table), rows)
+
+
+def notify_expiring(notifier, today: Optional[date] = None, days: Optional[int] = None,
+                    lookback_days: Optional[int] = None, batch_size: int = 500, record: bool = True) -> NotifyStats:
+    """Send every pending digest through ``notifier`` (inside an app context).
+
+    With ``record=False`` (a dry run) nothing is written, so the next run
+    sends the same digests.
+    """
+    config = current_app.config
+    today = today or date.today()
+    days = config['EXPIRY_NOTIFY_DAYS'] if days is None else days
+    lookback_days = config['EXPIRY_NOTIFY_LOOKBACK_DAYS'] if lookback_days is None else lookback_days
+    stats = NotifyStats()
+    if record:
+        stats.pruned = prune_notifications()
+        db.session.commit()
+
+    sent: List[ExpiringLot] = []
+    try:
+        for digest in find_expiring(today, days, lookback_days):
+            try:
+                notifier.send(digest)
+            except OSError:
+                logger.exception('Could not send the expiry digest of user %s', digest.user_id)
+                stats.failed += 1
+                continue
+            stats.users += 1
+            stats.lots += len(digest.lots)
+            sent.extend(digest.lots)
+            if record and stats.users % batch_size == 0:
+                record_notifications(sent)
+                db.session.commit()
+                sent = []
+    finally:
+        notifier.close()
+    if record and sent:
+        record_notifications(sent)
+        db.session.commit()
+    return stats
@@ -0,0 +1,72 @@
+"""Conditional GET for pages that depend only on the catalog and the user's inventory.
+
+``@inventory_etag`` derives a strong ETag from the recipe catalog version,
+the user's inventory version, today's date (expiry urgency changes daily),
+the URL and the deployed templates. A request whose ``If-None-Match``
+matches gets a 304 before the view runs, so no scoring, queries or
+rendering happen. Responses are ``private, no-cache``: browsers keep them
+but revalidate on every use.
+
+Pages rendered while flash messages are pending get no ETag, since the
+messages are part of the body but not of the tag.
+"""
+import hashlib
+import os
+from datetime import date
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+
+from app.utils.recipe_catalog import get_catalog
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates')
+
+
+def _deploy_version() -> str:
+    """Changes whenever a template or the derived-image manifest does, identically in every worker."""
+    from app.utils.recipe_images import DERIVED_DIR, MANIFEST_NAME
+
+    paths = [os.path.join(root, name) for root, _, names in os.walk(TEMPLATE_DIR) for name in names]
+    paths.append(os.path.join(DERIVED_DIR, MANIFEST_NAME))
+    stamps = []
+    for path in sorted(paths):
+        try:
+            stamps.append(f'{path}:{os.stat(path).st_mtime_ns}')
+        except OSError:
+            pass
+    return hashlib.sha1('\n'.join(stamps).encode()).hexdigest()[:12]
+
+
+def inventory_etag_value() -> str:
+    parts = (
+        current_app.config['ETAG_VERSION'], request.full_path, current_user.id,
+        current_user.inventory_version, get_catalog().version, date.today().isoformat(),
+    )
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def inventory_etag(view):
+    """Answer GETs with 304 when nothing the view depends on has changed."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+            return view(*args, **kwargs)
+        etag = inventory_etag_value()
+        if etag in request.if_none_match:
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or session.get('_flashes'):
+                return response
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+        return response
+    return wrapper
+
+
+def init_app(app) -> None:
+    if not app.config.get('ETAG_VERSION'):
+        app.config['ETAG_VERSION'] = _deploy_version()
@@ -0,0 +1,130 @@
+"""Ingredient identity: one row per normalized name, resolved through a process-local cache.
+
+``get_or_create_ingredient_id`` is the single get-or-create path for forms,
+shopping lists and importers. A cache hit costs no query; a miss is one
+``INSERT ... ON CONFLICT (normalized_name) DO UPDATE ... RETURNING id``, which
+returns the existing row's id when another request created it first, so
+concurrent submissions never produce duplicates.
+
+Ids enter the cache only once the transaction that resolved them commits, and
+names of renamed or deleted ingredients are dropped on commit. The TTL bounds
+how long another process's deletion can go unnoticed.
+"""
+from datetime import datetime
+from typing import Optional, Set
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models import Ingredient, normalize_ingredient_name
+from app.utils.cache import LRUCache
+from app.utils.db_dialect import upsert_insert
+
+
+def _cache() -> Optional[LRUCache]:
+    return current_app.extensions.get('ingredient_ids') if has_app_context() else None
+
+
+def get_or_create_ingredient_id(name: str, unit, category: Optional[str] = None) -> int:
+    """Return the id of the ingredient called ``name`` (normalized), creating it with ``unit`` if needed.
+
+    Runs inside the caller's transaction; nothing is committed here.
+    """
+    normalized = normalize_ingredient_name(name)
+    pending = db.session.info.get('ingredient_ids_pending')
+    if pending and normalized in pending:
+        return pending[normalized]
+    cache = _cache()
+    if cache is not None:
+        ingredient_id = cache.get(normalized)
+        if ingredient_id is not None:
+            return ingredient_id
+
+    unit = unit.name if hasattr(unit, 'name') else unit
+    insert = upsert_insert(db.session.get_bind())
+    if insert is not None:
+        table = Ingredient.__table__
+        stmt = insert(table).values(
+            name=normalized, normalized_name=normalized, unit=unit, category=category,
+            created_at=datetime.utcnow(),
+        )
+        # A no-op update (instead of DO NOTHING) makes RETURNING yield the existing row too
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.normalized_name],
+            set_={'normalized_name': stmt.excluded.normalized_name},
+        ).returning(table.c.id)
+        ingredient_id = db.session.execute(stmt).scalar_one()
+    else:
+        ingredient_id = db.session.execute(
+            select(Ingredient.id).where(Ingredient.normalized_name == normalized)
+        ).scalar()
+        if ingredient_id is None:
+            try:
+                with db.session.begin_nested():
+                    ingredient = Ingredient(name=normalized, unit=unit, category=category)
+                    db.session.add(ingredient)
+                ingredient_id = ingredient.id
+            except IntegrityError:
+                ingredient_id = db.session.execute(
+                    select(Ingredient.id).where(Ingredient.normalized_name == normalized)
+                ).scalar_one()
+
+    db.session.info.setdefault('ingredient_ids_pending', {})[normalized] = ingredient_id
+    return ingredient_id
+
+
+def get_or_create_ingredient(name: str, unit, category: Optional[str] = None) -> Ingredient:
+    """Like get_or_create_ingredient_id, but returns the (identity-mapped) Ingredient."""
+    return db.session.get(Ingredient, get_or_create_ingredient_id(name, unit, category))
+
+
+def invalidate_ingredient_cache() -> None:
+    cache = _cache()
+    if cache is not None:
+        cache.clear()
+
+
+def _after_flush(session, flush_context):
+    stale: Set[str] = set()
+    for obj in session.deleted:
+        if isinstance(obj, Ingredient):
+            stale.add(obj.normalized_name)
+    for obj in session.dirty:
+        if isinstance(obj, Ingredient):
+            history = inspect(obj).attrs.normalized_name.history
+            stale.update(history.deleted or ())
+    stale.discard(None)
+    if stale:
+        session.info.setdefault('ingredient_names_stale', set()).update(stale)
+
+
+def _after_commit(session):
+    pending = session.info.pop('ingredient_ids_pending', None)
+    stale = session.info.pop('ingredient_names_stale', None)
+    cache = _cache()
+    if cache is None:
+        return
+    for name in stale or ():
+        cache.pop(name)
+    for name, ingredient_id in (pending or {}).items():
+        if not stale or name not in stale:
+            cache.set(name, ingredient_id)
+
+
+def _after_rollback(session):
+    session.info.pop('ingredient_ids_pending', None)
+    session.info.pop('ingredient_names_stale', None)
+
+
+def init_app(app) -> None:
+    app.extensions['ingredient_ids'] = LRUCache(
+        maxsize=app.config.get('INGREDIENT_CACHE_SIZE', 10000),
+        ttl=app.config.get('INGREDIENT_CACHE_TTL', 3600),
+    )
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_rollback', _after_rollback)
@@ -1,10 +1,14 @@
 from datetime import date
-from typing import List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from flask_login import current_user
+from sqlalchemy import and_, bindparam, delete, func, or_, select, update
+from sqlalchemy.orm import contains_eager
 from app.extensions import db
-from app.models import UserInventory, Ingredient
-from app.utils.unit_service import convert_quantity, normalize_unit_string
+from app.models import UserInventory, Ingredient, User, normalize_ingredient_name
+from app.utils.ingredient_service import get_or_create_ingredient
+from app.utils.user_cache import mark_user_changed
+from app.utils.unit_service import UnitConversionError, convert_quantity, normalize_unit_string
 
 
 def get_user_inventory(user_id: int) -> List[UserInventory]:
@@ -16,17 +20,251 @@ def get_user_inventory(user_id: int) -> List[UserInventory]:
     )
 
 
+class InventoryPage:
+    """One keyset page of inventory items; ``next_cursor`` is None on the last page."""
+
+    def __init__(self, items: List[UserInventory], next_cursor: Optional[str]):
+        self.items = items
+        self.next_cursor = next_cursor
+
+
+def encode_inventory_cursor(item: UserInventory) -> str:
+    expiry = item.expiry_date.isoformat() if item.expiry_date else ''
+    return f'{expiry}:{item.id}'
+
+
+def decode_inventory_cursor(cursor: str) -> Optional[Tuple[Optional[date], int]]:
+    """Return (expiry_date, id) of the last item of the previous page, or None if malformed."""
+    try:
+        expiry, item_id = cursor.rsplit(':', 1)
+        return (date.fromisoformat(expiry) if expiry else None), int(item_id)
+    except ValueError:
+        return None
+
+
+def search_inventory(user_id: int, q: Optional[str] = None, after: Optional[str] = None,
+                     limit: int = 50) -> InventoryPage:
+    """Page through the user's items (soonest expiry first, undated last) in SQL.
+
+    ``q`` matches anywhere in the normalized ingredient name. Ingredients are
+    loaded in the same query. ``after`` is the ``next_cursor`` of the previous
+    page; keyset pagination keeps deep pages as cheap as the first one.
+    """
+    query = (
+        UserInventory.query
+        .join(UserInventory.ingredient)
+        .options(contains_eager(UserInventory.ingredient))
+        .filter(UserInventory.user_id == user_id)
+    )
+    q = normalize_ingredient_name(q) if q else None
+    if q:
+        query = query.filter(Ingredient.normalized_name.contains(q, autoescape=True))
+    position = decode_inventory_cursor(after) if after else None
+    if position is not None:
+        expiry, item_id = position
+        if expiry is None:
+            query = query.filter(UserInventory.expiry_date.is_(None), UserInventory.id > item_id)
+        else:
+            query = query.filter(or_(
+                UserInventory.expiry_date.is_(None),
+                UserInventory.expiry_date > expiry,
+                and_(UserInventory.expiry_date == expiry, UserInventory.id > item_id),
+            ))
+    items = (
+        query.order_by(UserInventory.expiry_date.is_(None), UserInventory.expiry_date.asc(), UserInventory.id.asc())
+        .limit(limit + 1)
+        .all()
+    )
+    next_cursor = encode_inventory_cursor(items[limit - 1]) if len(items) > limit else None
+    return InventoryPage(items[:limit], next_cursor)
+
+
+class InventorySnapshot:
+    """Per-request view of a user's inventory aggregated per ingredient."""
+
+    def __init__(self, quantities: Dict[int, float], earliest_expiry: Dict[int, date]):
+        self.quantities = quantities
+        self.earliest_expiry = earliest_expiry
+
+    def earliest_expiry_for(self, ingredient_ids: Iterable[int]) -> Optional[date]:
+        """Earliest expiry date among the given ingredients, or None if none of them expire."""
+        earliest = None
+        expiry = self.earliest_expiry
+        for ingredient_id in ingredient_ids:
+            d = expiry.get(ingredient_id)
+            if d is not None and (earliest is None or d < earliest):
+                earliest = d
+        return earliest
+
+
+def get_inventory_snapshot(user_id: int) -> InventorySnapshot:
+    """Load total quantity and earliest expiry per ingredient in a single grouped query."""
+    rows = (
+        db.session.query(
+            UserInventory.ingredient_id,
+            func.sum(UserInventory.quantity),
+            func.min(UserInventory.expiry_date),
+        )
+        .filter(UserInventory.user_id == user_id)
+        .group_by(UserInventory.ingredient_id)
+        .all()
+    )
+    quantities = {}
+    earliest_expiry = {}
+    for ingredient_id, quantity, expiry_date in rows:
+        quantities[ingredient_id] = quantity or 0
+        if expiry_date is not None:
+            earliest_expiry[ingredient_id] = expiry_date
+    return InventorySnapshot(quantities, earliest_expiry)
+
+
+def bump_inventory_version(user_id: int) -> None:
+    """Mark the user's inventory as changed, inside the caller's transaction."""
+    db.session.execute(
+        update(User).where(User.id == user_id).values(inventory_version=User.inventory_version + 1)
+    )
+    mark_user_changed(user_id)
+
+
+class InventoryConflict(Exception):
+    """Raised when inventory lots changed between reading and writing them."""
+
+
+class FefoAllocation:
+    """How a set of requirements is taken from inventory lots, first-expiring-first-out.
+
+    ``updates`` holds (lot id, old quantity, new quantity) for partly used lots,
+    ``deletes`` (lot id, old quantity) for used-up lots, ``used`` the quantity
+    taken per ingredient and ``shortfall`` what the lots could not cover.
+    """
+
+    def __init__(self):
+        self.updates: List[Tuple[int, float, float]] = []
+        self.deletes: List[Tuple[int, float]] = []
+        self.used: Dict[int, float] = {}
+        self.shortfall: Dict[int, float] = {}
+
+
+def load_inventory_lots(user_id: int, ingredient_ids: Iterable[int], lock: bool = True) -> List[tuple]:
+    """Load (id, ingredient_id, quantity) of the user's lots for the given ingredients in FEFO order.
+
+    With ``lock`` the rows are selected FOR UPDATE on backends that support it;
+    SQLite ignores the clause and relies on the compare-and-swap in
+    ``apply_fefo_allocation`` instead.
+    """
+    ingredient_ids = list(ingredient_ids)
+    if not ingredient_ids:
+        return []
+    stmt = (
+        select(UserInventory.id, UserInventory.ingredient_id, UserInventory.quantity)
+        .where(UserInventory.user_id == user_id, UserInventory.ingredient_id.in_(ingredient_ids))
+        .order_by(UserInventory.expiry_date.is_(None), UserInventory.expiry_date.asc(), UserInventory.id.asc())
+    )
+    if lock:
+        stmt = stmt.with_for_update()
+    return db.session.execute(stmt).all()
+
+
+def get_inventory_lots(user_id: int) -> List[tuple]:
+    """Load (id, ingredient_id, quantity, expiry_date) of all the user's lots in FEFO order."""
+    return db.session.execute(
+        select(UserInventory.id, UserInventory.ingredient_id, UserInventory.quantity, UserInventory.expiry_date)
+        .where(UserInventory.user_id == user_id)
+        .order_by(UserInventory.expiry_date.is_(None), UserInventory.expiry_date.asc(), UserInventory.id.asc())
+    ).all()
+
+
+def allocate_fefo(lots: Iterable[tuple], needed: Dict[int, float]) -> FefoAllocation:
+    """Take ``needed`` (ingredient id -> quantity) from ``lots`` given in FEFO order."""
+    allocation = FefoAllocation()
+    remaining = {ingredient_id: qty for ingredient_id, qty in needed.items() if qty > 0}
+    for lot_id, ingredient_id, quantity in lots:
+        want = remaining.get(ingredient_id, 0)
+        if want <= 0 or quantity <= 0:
+            continue
+        take = min(quantity, want)
+        remaining[ingredient_id] = want - take
+        allocation.used[ingredient_id] = allocation.used.get(ingredient_id, 0) + take
+        if quantity - take <= 0:
+            allocation.deletes.append((lot_id, quantity))
+        else:
+            allocation.updates.append((lot_id, quantity, quantity - take))
+    allocation.shortfall = {ingredient_id: qty for ingredient_id, qty in remaining.items() if qty > 0}
+    return allocation
+
+
+def allocate_fefo_sequence(lots: Iterable[tuple], needs: Iterable[Dict[int, float]]) -> List[FefoAllocation]:
+    """Allocate several requirement sets in turn, each from what the previous ones left over."""
+    lots = list(lots)
+    allocations = []
+    for needed in needs:
+        allocation = allocate_fefo(lots, needed)
+        left = {lot_id: new for lot_id, _, new in allocation.updates}
+        left.update((lot_id, 0) for lot_id, _ in allocation.deletes)
+        if left:
+            lots = [(lot_id, ingredient_id, left.get(lot_id, qty)) for lot_id, ingredient_id, qty in lots
+                    if left.get(lot_id, qty) > 0]
+        allocations.append(allocation)
+    return allocations
+
+
+def apply_fefo_allocation(allocation: FefoAllocation) -> None:
+    """Write an allocation back with one bulk UPDATE and one bulk DELETE.
+
+    Every statement only matches a lot whose quantity is still the one the
+    allocation was computed from, so a concurrent change makes the row count
+    come up short and raises InventoryConflict; the caller rolls back and
+    retries.
+    """
+    table = UserInventory.__table__
+    checked = db.session.get_bind().dialect.supports_sane_multi_rowcount
+    if allocation.updates:
+        result = db.session.execute(
+            update(table)
+            .where(table.c.id == bindparam('lot_id'), table.c.quantity == bindparam('old_quantity'))
+            .values(quantity=bindparam('new_quantity')),
+            [{'lot_id': i, 'old_quantity': old, 'new_quantity': new} for i, old, new in allocation.updates],
+        )
+        if checked and result.rowcount != len(allocation.updates):
+            raise InventoryConflict()
+    if allocation.deletes:
+        result = db.session.execute(
+            delete(table)
+            .where(table.c.id == bindparam('lot_id'), table.c.quantity == bindparam('old_quantity')),
+            [{'lot_id': i, 'old_quantity': old} for i, old in allocation.deletes],
+        )
+        if checked and result.rowcount != len(allocation.deletes):
+            raise InventoryConflict()
+
+
+def consume_inventory(user_id: int, needed: Dict[int, float]) -> FefoAllocation:
+    """Deduct ``needed`` from the user's inventory inside the caller's transaction.
+
+    Raises InventoryConflict if the lots changed concurrently; nothing is
+    committed here.
+    """
+    lots = load_inventory_lots(user_id, needed.keys())
+    allocation = allocate_fefo(lots, needed)
+    apply_fefo_allocation(allocation)
+    if allocation.updates or allocation.deletes:
+        bump_inventory_version(user_id)
+    return allocation
+
+
 def get_expiring_items(user_id: int, days: int = 7) -> List[UserInventory]:
-    """Return items expiring within the next N days."""
+    """Return items expiring within the next N days (or already expired), with their ingredients loaded."""
     today = date.today()
     cutoff = date.fromordinal(today.toordinal() + days)
     return (
-        UserInventory.query.filter(
+        UserInventory.query
+        .join(UserInventory.ingredient)
+        .options(contains_eager(UserInventory.ingredient))
+        .filter(
             UserInventory.user_id == user_id,
             UserInventory.expiry_date != None,
             UserInventory.expiry_date <= cutoff,
         )
-        .order_by(UserInventory.expiry_date.asc())
+        .order_by(UserInventory.expiry_date.asc(), UserInventory.id.asc())
         .all()
     )
 
@@ -38,12 +276,16 @@ def add_inventory_item(
     unit: Optional[str] = None,
     expiry_date: Optional[date] = None,
 ) -> UserInventory:
-    """Create a new inventory item for the user, normalizing quantity to the ingredient's canonical unit."""
+    """Create a new inventory item for the user, normalizing quantity to the ingredient's canonical unit.
+
+    Raises UnitConversionError when ``unit`` cannot be converted to that unit.
+    """
     ing = Ingredient.query.get(ingredient_id)
     ing_unit_value = ing.unit.value if hasattr(ing.unit, 'value') else ing.unit
     input_unit = normalize_unit_string(unit) if unit else ing_unit_value
-    converted_qty = convert_quantity(quantity, input_unit, ing_unit_value)
-    final_qty = converted_qty if converted_qty is not None else quantity
+    final_qty = convert_quantity(quantity, input_unit, ing_unit_value, ing.name)
+    if final_qty is None:
+        raise UnitConversionError(f'Cannot convert {input_unit} of {ing.name} to {ing_unit_value}')
 
     item = UserInventory(
         user_id=user_id,
@@ -52,6 +294,7 @@ def add_inventory_item(
         expiry_date=expiry_date,
     )
     db.session.add(item)
+    bump_inventory_version(user_id)
     db.session.commit()
     return item
 
@@ -62,19 +305,16 @@ def delete_inventory_item(user_id: int, item_id: int) -> bool:
     if not item:
         return False
     db.session.delete(item)
+    bump_inventory_version(user_id)
     db.session.commit()
     return True
 
 
 def find_or_create_ingredient(name: str, default_unit: str, category: Optional[str] = None) -> Ingredient:
-    """Utility: case-insensitive ingredient lookup; create if not found.
+    """Utility: lookup by normalized name; create if not found.
     Requires a default_unit when creating a new ingredient, because Ingredient.unit is non-nullable.
     Optionally accepts a category for new ingredients.
     """
-    ing = Ingredient.query.filter(Ingredient.name.ilike(name)).first()
-    if ing:
-        return ing
-    ing = Ingredient(name=name.strip(), unit=default_unit, category=category)
-    db.session.add(ing)
+    ing = get_or_create_ingredient(name, default_unit, category)
     db.session.commit()
     return ing
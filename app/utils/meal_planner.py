@@ -0,0 +1,273 @@
+"""Expiry-driven meal plans over the compiled recipe catalog.
+
+A plan assigns one distinct recipe to each of the next N days. Recipes are
+allocated from the user's lots in plan order, earliest expiry first, and a lot
+can only be used on or before its expiry date. A plan is scored by
+
+    sum(lot urgency * share of the lot used) - buy_weight * sum(share of each requirement bought)
+
+where a lot expiring in ``d`` days has urgency ``1 / (1 + d)`` and undated lots
+have none. Both terms are unit-free, so grams and pieces compare fairly.
+
+The solver builds the plan greedily, day by day, from a candidate pool, then
+improves it by local search (replace one day's recipe with a pool recipe, or
+swap two days) until no move helps or the time budget runs out. The pool is
+chosen cheaply first: recipes are pre-scored by the summed urgency of their
+expiring ingredients through the catalog's inverted index, and only the best
+``PRESCORE_FACTOR`` times the pool size are scored by allocation. Every stage
+checks a hard deadline, so plans stay interactive on large catalogs.
+"""
+import heapq
+import random
+import time
+from itertools import islice
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.utils.recipe_catalog import CatalogRecipe, RecipeCatalog
+
+DEFAULT_BUY_WEIGHT = 0.5
+
+# Recipes scored by allocation per candidate slot, after the urgency pre-score
+PRESCORE_FACTOR = 8
+
+
+class PlannerLot:
+    __slots__ = ('index', 'ingredient_id', 'quantity', 'days', 'urgency')
+
+    def __init__(self, index: int, ingredient_id: int, quantity: float, days: Optional[int]):
+        self.index = index
+        self.ingredient_id = ingredient_id
+        self.quantity = quantity
+        self.days = days
+        self.urgency = 1.0 / (1 + days) if days is not None else 0.0
+
+
+class PlanDay:
+    """One planned day: the recipe, what it uses from inventory and what must be bought."""
+
+    def __init__(self, day: date, recipe: CatalogRecipe, rescued: float, missing: List[dict]):
+        self.day = day
+        self.recipe = recipe
+        self.rescued = rescued
+        self.missing = missing
+
+
+class MealPlan:
+    def __init__(self, days: List[PlanDay], shopping: List[dict], score: float, greedy_score: float,
+                 evaluations: int, elapsed: float, timed_out: bool):
+        self.days = days
+        self.shopping = shopping
+        self.score = score
+        # Score before local search, to see what the search adds
+        self.greedy_score = greedy_score
+        self.evaluations = evaluations
+        self.elapsed = elapsed
+        self.timed_out = timed_out
+
+
+class MealPlanner:
+    """Plan ``days`` meals for one inventory; see the module docstring for the objective."""
+
+    def __init__(self, catalog: RecipeCatalog, lots: Iterable[tuple], today: Optional[date] = None,
+                 buy_weight: float = DEFAULT_BUY_WEIGHT):
+        self.catalog = catalog
+        self.today = today or date.today()
+        self.buy_weight = buy_weight
+        self.lots: List[PlannerLot] = []
+        self.lots_by_ingredient: Dict[int, List[PlannerLot]] = {}
+        # Lots arrive in FEFO order; lots already past their expiry are not planned with
+        for lot_id, ingredient_id, quantity, expiry_date in lots:
+            days = (expiry_date - self.today).days if expiry_date is not None else None
+            if (days is not None and days < 0) or not quantity or quantity <= 0:
+                continue
+            lot = PlannerLot(len(self.lots), ingredient_id, quantity, days)
+            self.lots.append(lot)
+            self.lots_by_ingredient.setdefault(ingredient_id, []).append(lot)
+        self._requirements: Dict[int, Tuple[Tuple[int, float], ...]] = {}
+        self.evaluations = 0
+
+    def requirements(self, idx: int) -> Tuple[Tuple[int, float], ...]:
+        reqs = self._requirements.get(idx)
+        if reqs is None:
+            merged: Dict[int, float] = {}
+            for ingredient_id, qty in self.catalog.requirements(idx):
+                merged[ingredient_id] = merged.get(ingredient_id, 0) + qty
+            reqs = self._requirements[idx] = tuple((i, q) for i, q in merged.items() if q > 0)
+        return reqs
+
+    def _cook(self, idx: int, day: int, left: List[float], shortfall: Optional[Dict[int, float]] = None,
+              commit: bool = True) -> float:
+        """Allocate recipe ``idx`` on plan day ``day`` from ``left``; return its objective contribution.
+
+        With ``commit=False`` ``left`` is only read. Requirements are merged per
+        ingredient, so a recipe visits every lot at most once and the result is
+        the same without copying ``left``.
+        """
+        value = 0.0
+        penalty = 0.0
+        for ingredient_id, needed in self.requirements(idx):
+            remaining = needed
+            for lot in self.lots_by_ingredient.get(ingredient_id, ()):
+                if remaining <= 0:
+                    break
+                if lot.days is not None and lot.days < day:
+                    continue
+                available = left[lot.index]
+                if available <= 0:
+                    continue
+                take = available if available < remaining else remaining
+                if commit:
+                    left[lot.index] = available - take
+                remaining -= take
+                value += lot.urgency * take / lot.quantity
+            if remaining > 0:
+                penalty += remaining / needed
+                if shortfall is not None:
+                    shortfall[ingredient_id] = shortfall.get(ingredient_id, 0) + remaining
+        return value - self.buy_weight * penalty
+
+    def evaluate(self, plan: List[int]) -> float:
+        self.evaluations += 1
+        left = [lot.quantity for lot in self.lots]
+        return sum(self._cook(idx, day, left) for day, idx in enumerate(plan))
+
+    def candidates(self, limit: int, deadline: float, diet_id: Optional[int] = None) -> Tuple[List[int], bool]:
+        """Up to ``limit`` recipes, best stand-alone score for today first, and whether time ran out.
+
+        Recipes are pre-scored by the summed urgency of their expiring
+        ingredients; the best ``PRESCORE_FACTOR * limit`` of them are scored by
+        allocation while time allows, the rest keep pre-score order. Recipes
+        without expiring ingredients only fill a pool that would be too small.
+        """
+        allowed = set(self.catalog.recipes_with_diet(diet_id)) if diet_id is not None else None
+        prescore: Dict[int, float] = {}
+        timed_out = False
+        for ingredient_id, lots in self.lots_by_ingredient.items():
+            urgency = max(lot.urgency for lot in lots)
+            if not urgency:
+                continue
+            if time.perf_counter() > deadline:
+                timed_out = True
+                break
+            # Each stocked requirement also avoids most of its buy penalty
+            gain = urgency + self.buy_weight
+            for idx in self.catalog.recipes_using(ingredient_id):
+                prescore[idx] = prescore.get(idx, 0.0) + gain
+        offsets = self.catalog.offsets
+        for idx in prescore:
+            prescore[idx] -= self.buy_weight * (offsets[idx + 1] - offsets[idx])
+        if allowed is not None:
+            prescore = {idx: value for idx, value in prescore.items() if idx in allowed}
+        ranked = heapq.nlargest(PRESCORE_FACTOR * limit, prescore, key=prescore.__getitem__)
+        if len(ranked) < limit:
+            fill = (idx for idx in (sorted(allowed) if allowed is not None else range(len(self.catalog)))
+                    if idx not in prescore)
+            ranked.extend(islice(fill, limit - len(ranked)))
+
+        left = [lot.quantity for lot in self.lots]
+        scored = []
+        for n, idx in enumerate(ranked):
+            if time.perf_counter() > deadline:
+                timed_out = True
+                break
+            scored.append((-self._cook(idx, 0, left, commit=False), n, idx))
+        scored.sort()
+        pool = [idx for _, _, idx in scored[:limit]]
+        pool.extend(ranked[len(scored):len(scored) + limit - len(pool)])
+        return pool, timed_out
+
+    def solve(self, days: int, time_budget: float, pool_size: int = 300, diet_id: Optional[int] = None,
+              seed: int = 0, local_search: bool = True) -> MealPlan:
+        started = time.perf_counter()
+        deadline = started + time_budget
+        self.evaluations = 0
+        pool, timed_out = self.candidates(max(pool_size, days), deadline, diet_id)
+        days = min(days, len(pool))
+
+        # Greedy: each day takes the recipe with the best marginal gain on what is left
+        plan: List[int] = []
+        left = [lot.quantity for lot in self.lots]
+        for day in range(days):
+            used = set(plan)
+            best, best_gain = None, None
+            for idx in pool:
+                if idx in used:
+                    continue
+                if best is not None and time.perf_counter() > deadline:
+                    timed_out = True
+                    break
+                gain = self._cook(idx, day, left, commit=False)
+                self.evaluations += 1
+                if best_gain is None or gain > best_gain:
+                    best, best_gain = idx, gain
+            plan.append(best)
+            self._cook(best, day, left)
+        score = greedy_score = self.evaluate(plan)
+        if local_search and not timed_out:
+            plan, score, timed_out = self._improve(plan, score, pool, deadline, random.Random(seed))
+        return self._build(plan, score, greedy_score, started, timed_out)
+
+    def _improve(self, plan: List[int], score: float, pool: List[int], deadline: float,
+                 rng: random.Random) -> Tuple[List[int], float, bool]:
+        """First-improvement local search over ``plan``; returns the plan, its score and whether time ran out.
+
+        Moves are tried in random order and every improving one is kept at
+        once; passes repeat until one finds nothing to improve.
+        """
+        days = len(plan)
+        moves = [(day, idx, True) for day in range(days) for idx in pool]
+        moves += [(a, b, False) for a in range(days) for b in range(a + 1, days)]
+        improved = True
+        while improved:
+            improved = False
+            rng.shuffle(moves)
+            in_plan = set(plan)
+            for a, b, replace in moves:
+                if time.perf_counter() > deadline:
+                    return plan, score, True
+                if replace:
+                    if b in in_plan:
+                        continue
+                    trial = plan[:a] + [b] + plan[a + 1:]
+                else:
+                    trial = list(plan)
+                    trial[a], trial[b] = trial[b], trial[a]
+                trial_score = self.evaluate(trial)
+                if trial_score > score + 1e-9:
+                    plan, score = trial, trial_score
+                    in_plan = set(plan)
+                    improved = True
+        return plan, score, False
+
+    def _build(self, plan: List[int], score: float, greedy_score: float, started: float,
+               timed_out: bool) -> MealPlan:
+        left = [lot.quantity for lot in self.lots]
+        total_shortfall: Dict[int, float] = {}
+        plan_days = []
+        for day, idx in enumerate(plan):
+            before = list(left)
+            shortfall: Dict[int, float] = {}
+            self._cook(idx, day, left, shortfall)
+            rescued = sum(lot.urgency * (before[lot.index] - left[lot.index]) / lot.quantity for lot in self.lots)
+            for ingredient_id, qty in shortfall.items():
+                total_shortfall[ingredient_id] = total_shortfall.get(ingredient_id, 0) + qty
+            plan_days.append(PlanDay(self.today + timedelta(days=day), self.catalog.recipes[idx],
+                                     rescued, self._missing(shortfall)))
+        return MealPlan(plan_days, self._missing(total_shortfall), score, greedy_score, self.evaluations,
+                        time.perf_counter() - started, timed_out)
+
+    def _missing(self, shortfall: Dict[int, float]) -> List[dict]:
+        missing = []
+        for ingredient_id, qty in shortfall.items():
+            ingredient = self.catalog.ingredients[ingredient_id]
+            missing.append({'id': ingredient_id, 'name': ingredient.name, 'missing': qty, 'unit': ingredient.unit})
+        missing.sort(key=lambda m: m['name'])
+        return missing
+
+
+def plan_meals(catalog: RecipeCatalog, lots: Iterable[tuple], days: int, time_budget: float,
+               diet_id: Optional[int] = None, pool_size: int = 300, today: Optional[date] = None) -> MealPlan:
+    """Plan ``days`` distinct recipes from ``lots`` ((id, ingredient_id, quantity, expiry_date) in FEFO order)."""
+    planner = MealPlanner(catalog, lots, today=today)
+    return planner.solve(days, time_budget, pool_size=pool_size, diet_id=diet_id)
@@ -0,0 +1,300 @@
+"""Process-wide, read-only compiled recipe catalog.
+
+The recommendation engine needs every recipe's requirements in the
+ingredient's canonical unit. Loading them through the ORM costs one lazy query
+per recipe and per ingredient, so the catalog compiles them once into flat
+arrays (CSR layout: ``offsets[i]:offsets[i + 1]`` slices ``ingredient_ids``
+and ``needed`` for recipe ``i``) and keeps them until the recipe tables change.
+
+Changes are tracked through the single-row ``catalog_version`` table: every
+commit that touches ``Recipe``, ``RecipeIngredient``, ``DietaryStuff`` or an
+existing ``Ingredient`` bumps it, so scripts such as ``import_recipes_to_db.py`` and
+``seedscript.py`` invalidate the catalog of a running server as well.
+"""
+import logging
+import threading
+import time
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, insert, update
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models import CatalogVersion, DietaryStuff, Ingredient, Recipe, RecipeIngredient
+from app.utils.unit_service import convert_many
+
+logger = logging.getLogger(__name__)
+
+CATALOG_TABLES = (Recipe, RecipeIngredient, DietaryStuff)
+
+
+class CatalogRecipe:
+    """Lightweight, immutable view of a Recipe row used for listing and scoring."""
+
+    __slots__ = (
+        'id', 'name', 'description', 'image_url', 'servings', 'prep_time', 'cook_time',
+        'total_time', 'difficulty', 'cuisine', 'diet_id', 'average_rating',
+    )
+
+    def __init__(self, row):
+        self.id = row.id
+        self.name = row.name
+        self.description = row.description
+        self.image_url = row.image_url
+        self.servings = row.servings
+        self.prep_time = row.prep_time
+        self.cook_time = row.cook_time
+        self.total_time = (row.prep_time or 0) + (row.cook_time or 0)
+        self.difficulty = row.difficulty
+        self.cuisine = row.cuisine
+        self.diet_id = row.diet_id
+        rating_count = row.rating_count or 0
+        self.average_rating = round((row.rating_sum or 0) / rating_count, 2) if rating_count > 0 else 0
+
+    def __repr__(self):
+        return f'<CatalogRecipe {self.name}>'
+
+
+class CatalogIngredient:
+    __slots__ = ('id', 'name', 'unit')
+
+    def __init__(self, id: int, name: str, unit: str):
+        self.id = id
+        self.name = name
+        self.unit = unit
+
+
+class RecipeCatalog:
+    """Compiled recipes plus their requirements in canonical ingredient units."""
+
+    def __init__(self, version: int, recipes: List[CatalogRecipe], ingredients: Dict[int, CatalogIngredient],
+                 offsets: array, ingredient_ids: array, needed: array,
+                 diets: Optional[List[Tuple[int, str]]] = None):
+        self.version = version
+        self.recipes = recipes
+        self.ingredients = ingredients
+        self.offsets = offsets
+        self.ingredient_ids = ingredient_ids
+        self.needed = needed
+        self.diets = diets or []
+        self.index_by_id = {r.id: i for i, r in enumerate(recipes)}
+        self._derived = {}
+
+    def __len__(self):
+        return len(self.recipes)
+
+    def index_of(self, recipe_id: int) -> Optional[int]:
+        return self.index_by_id.get(recipe_id)
+
+    def requirements(self, idx: int) -> Iterator[Tuple[int, float]]:
+        """Yield (ingredient_id, needed quantity in the ingredient's unit) for recipe ``idx``."""
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        return zip(self.ingredient_ids[start:end], self.needed[start:end])
+
+    def recipe_ingredient_ids(self, idx: int) -> array:
+        return self.ingredient_ids[self.offsets[idx]:self.offsets[idx + 1]]
+
+    def recipes_using(self, ingredient_id: int) -> array:
+        """Indices of the recipes that require ``ingredient_id`` (inverted index)."""
+        return self.derived('ingredient_index', _build_ingredient_index).get(ingredient_id, _EMPTY_INDEX)
+
+    def recipes_with_diet(self, diet_id: int) -> array:
+        """Ascending indices of the recipes tagged with ``diet_id``."""
+        return self.derived('diet_index', _build_diet_index).get(diet_id, _EMPTY_INDEX)
+
+    def derived(self, key: str, factory):
+        """Return a structure computed from this catalog, building it on first use.
+
+        Derived data lives and dies with the catalog, so it never outlives a
+        change to the recipe tables.
+        """
+        value = self._derived.get(key)
+        if value is None:
+            value = self._derived[key] = factory(self)
+        return value
+
+    @classmethod
+    def load(cls, version: int) -> 'RecipeCatalog':
+        """Compile the catalog with one query per table instead of one per recipe."""
+        recipe_rows = (
+            db.session.query(
+                Recipe.id, Recipe.name, Recipe.description, Recipe.image_url, Recipe.servings,
+                Recipe.prep_time, Recipe.cook_time, Recipe.difficulty, Recipe.cuisine, Recipe.diet_id,
+                Recipe.rating_sum, Recipe.rating_count,
+            )
+            .order_by(Recipe.id)
+            .all()
+        )
+        ingredient_rows = (
+            db.session.query(Ingredient.id, Ingredient.name, Ingredient.unit)
+            .join(RecipeIngredient, RecipeIngredient.ingredient_id == Ingredient.id)
+            .distinct()
+            .all()
+        )
+        diets = [
+            (row.id, row.diet_name)
+            for row in db.session.query(DietaryStuff.id, DietaryStuff.diet_name).order_by(DietaryStuff.diet_name)
+        ]
+        requirement_rows = (
+            db.session.query(RecipeIngredient.recipe_id, RecipeIngredient.ingredient_id,
+                             RecipeIngredient.quantity, RecipeIngredient.unit)
+            .order_by(RecipeIngredient.recipe_id, RecipeIngredient.ingredient_id)
+            .all()
+        )
+
+        ingredients = {}
+        for row in ingredient_rows:
+            unit_value = row.unit.value if hasattr(row.unit, 'value') else row.unit
+            ingredients[row.id] = CatalogIngredient(row.id, row.name, unit_value)
+
+        recipes = [CatalogRecipe(row) for row in recipe_rows]
+        position = {r.id: i for i, r in enumerate(recipes)}
+        # Rows arrive ordered by recipe id, like ``recipes``, so each recipe's slice is contiguous
+        counts = [0] * len(recipes)
+        ingredient_ids = array('l')
+        needed = array('d')
+        by_ingredient: Dict[int, Tuple[List[int], List[float], List[str]]] = {}
+        for recipe_id, ingredient_id, quantity, unit in requirement_rows:
+            idx = position.get(recipe_id)
+            if idx is None:
+                continue
+            counts[idx] += 1
+            positions, quantities, units = by_ingredient.setdefault(ingredient_id, ([], [], []))
+            positions.append(len(ingredient_ids))
+            quantities.append(quantity or 0)
+            units.append(unit)
+            ingredient_ids.append(ingredient_id)
+            needed.append(quantity or 0)
+
+        offsets = array('l', [0])
+        for count in counts:
+            offsets.append(offsets[-1] + count)
+
+        for ingredient_id, (positions, quantities, units) in by_ingredient.items():
+            ingredient = ingredients[ingredient_id]
+            converted = convert_many(quantities, units, ingredient.unit, ingredient.name)
+            for pos, quantity, unit, value in zip(positions, quantities, units, converted):
+                if value is None:
+                    # Left in the recipe's unit; flagged so bad data does not go unnoticed
+                    logger.warning('Cannot convert %s %s of %r to %s; comparing raw quantities',
+                                   quantity, unit, ingredient.name, ingredient.unit)
+                else:
+                    needed[pos] = value
+
+        return cls(version, recipes, ingredients, offsets, ingredient_ids, needed, diets)
+
+
+_EMPTY_INDEX = array('l')
+
+
+def _build_ingredient_index(catalog: RecipeCatalog) -> Dict[int, array]:
+    index: Dict[int, array] = {}
+    offsets = catalog.offsets
+    ingredient_ids = catalog.ingredient_ids
+    for idx in range(len(catalog.recipes)):
+        for pos in range(offsets[idx], offsets[idx + 1]):
+            ingredient_id = ingredient_ids[pos]
+            if ingredient_id not in index:
+                index[ingredient_id] = array('l')
+            index[ingredient_id].append(idx)
+    return index
+
+
+def _build_diet_index(catalog: RecipeCatalog) -> Dict[int, array]:
+    index: Dict[int, array] = {}
+    for idx, recipe in enumerate(catalog.recipes):
+        if recipe.diet_id is not None:
+            index.setdefault(recipe.diet_id, array('l')).append(idx)
+    return index
+
+
+def read_catalog_version() -> int:
+    return db.session.query(CatalogVersion.version).filter_by(id=1).scalar() or 0
+
+
+def bump_catalog_version(connection=None) -> None:
+    """Increment the persisted catalog version inside the caller's transaction.
+
+    ORM changes are picked up automatically; call this after Core-level bulk
+    writes to the recipe tables, which bypass the session flush events.
+    """
+    conn = connection if connection is not None else db.session.connection()
+    table = CatalogVersion.__table__
+    result = conn.execute(update(table).where(table.c.id == 1).values(version=table.c.version + 1))
+    if result.rowcount == 0:
+        conn.execute(insert(table).values(id=1, version=1))
+    if connection is None:
+        db.session.info['catalog_changed'] = True
+
+
+class CatalogHolder:
+    """Keeps the compiled catalog for one app and revalidates it against the DB version."""
+
+    def __init__(self, check_interval: float):
+        self.check_interval = check_interval
+        self._catalog: Optional[RecipeCatalog] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, fresh: bool = False) -> RecipeCatalog:
+        """The current catalog; ``fresh`` checks the DB version now instead of after the interval."""
+        catalog = self._catalog
+        if catalog is not None and not fresh and time.monotonic() - self._checked_at < self.check_interval:
+            return catalog
+        with self._lock:
+            version = read_catalog_version()
+            if self._catalog is None or self._catalog.version != version:
+                self._catalog = RecipeCatalog.load(version)
+            self._checked_at = time.monotonic()
+            return self._catalog
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._catalog = None
+            self._checked_at = 0.0
+
+
+def get_catalog(fresh: bool = False) -> RecipeCatalog:
+    return current_app.extensions['recipe_catalog'].get(fresh)
+
+
+def invalidate_catalog() -> None:
+    holder = current_app.extensions.get('recipe_catalog')
+    if holder is not None:
+        holder.invalidate()
+
+
+def _touches_catalog(session: Session) -> bool:
+    for obj in session.new:
+        if isinstance(obj, CATALOG_TABLES):
+            return True
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, CATALOG_TABLES + (Ingredient,)):
+            return True
+    return False
+
+
+def _after_flush(session, flush_context):
+    if session.info.get('catalog_changed') or not _touches_catalog(session):
+        return
+    bump_catalog_version(session.connection())
+    session.info['catalog_changed'] = True
+
+
+def _after_commit(session):
+    if session.info.pop('catalog_changed', False) and has_app_context():
+        invalidate_catalog()
+
+
+def _after_rollback(session):
+    session.info.pop('catalog_changed', None)
+
+
+def init_app(app) -> None:
+    app.extensions['recipe_catalog'] = CatalogHolder(app.config.get('RECIPE_CATALOG_CHECK_INTERVAL', 5.0))
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_rollback', _after_rollback)
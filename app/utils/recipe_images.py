@@ -0,0 +1,223 @@
+"""Resized recipe image variants, referenced through a content-hashed manifest.
+
+``build_derivatives`` (run by ``build_images.py``) writes a ``thumb`` and a
+``detail`` variant of every image in ``app/static``, each as JPEG and WebP,
+to ``app/static/derived`` under names that embed a hash of their bytes, and
+records them in ``derived/manifest.json``. Because a file's name changes
+whenever its content does, ``/static/derived/`` is served with a one-year
+``immutable`` Cache-Control. Templates look images up with the
+``recipe_image`` global and fall back to the original file when the manifest
+has no entry (e.g. the build step has not run). Building needs Pillow;
+serving does not.
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from flask import abort, send_from_directory, url_for
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - optional dependency
+    Image = ImageOps = None
+
+HAS_PILLOW = Image is not None
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static')
+DERIVED_DIR = os.path.join(STATIC_DIR, 'derived')
+MANIFEST_NAME = 'manifest.json'
+
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+# Longest edge of each variant: cards render at h-40 in a 3-column grid, the
+# detail page at a third of max-w-2xl; both sized for 2x displays
+VARIANTS = {'thumb': 480, 'detail': 960}
+JPEG_QUALITY = 80
+WEBP_QUALITY = 75
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def _digest(data: bytes, length: int = 10) -> str:
+    return hashlib.sha256(data).hexdigest()[:length]
+
+
+def _encode(image, fmt: str) -> bytes:
+    out = io.BytesIO()
+    if fmt == 'jpeg':
+        image.convert('RGB').save(out, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    else:
+        image.save(out, 'WEBP', quality=WEBP_QUALITY, method=6)
+    return out.getvalue()
+
+
+def render_image(source_path: str, output_dir: str) -> dict:
+    """Write every variant of one source image; return its manifest entry.
+
+    Runs in a worker process, so it only takes and returns plain data.
+    """
+    with open(source_path, 'rb') as f:
+        data = f.read()
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    entry = {'source_hash': _digest(data, 64), 'variants': {}}
+    with Image.open(io.BytesIO(data)) as original:
+        original = ImageOps.exif_transpose(original)
+        for variant, edge in VARIANTS.items():
+            image = original.copy()
+            image.thumbnail((edge, edge), Image.LANCZOS)
+            files = {'width': image.width, 'height': image.height}
+            for fmt, ext in (('jpeg', 'jpg'), ('webp', 'webp')):
+                encoded = _encode(image, fmt)
+                name = f'{stem}-{variant}-{_digest(encoded)}.{ext}'
+                path = os.path.join(output_dir, name)
+                if not os.path.exists(path):
+                    with open(path, 'wb') as f:
+                        f.write(encoded)
+                files[fmt] = name
+            entry['variants'][variant] = files
+    return entry
+
+
+def load_manifest(path: Optional[str] = None) -> Dict[str, dict]:
+    path = path or os.path.join(DERIVED_DIR, MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('images', {})
+    except (OSError, ValueError):
+        return {}
+
+
+def build_derivatives(source_dir: str = STATIC_DIR, output_dir: str = DERIVED_DIR, workers: Optional[int] = None,
+                      force: bool = False) -> dict:
+    """Build variants for every image in ``source_dir`` across a process pool.
+
+    Images whose source hash matches the existing manifest are skipped, and
+    derived files no longer referenced by the manifest are removed. Images
+    that fail to build are logged and left out of the manifest, so templates
+    fall back to the original. Returns counts of built, unchanged and removed
+    items, and the names of the images that failed.
+    """
+    if not HAS_PILLOW:
+        raise RuntimeError('Building image variants requires Pillow (pip install Pillow)')
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    previous = {} if force else load_manifest(manifest_path)
+
+    images, todo, failed = {}, [], []
+    for name in sorted(os.listdir(source_dir)):
+        path = os.path.join(source_dir, name)
+        if not name.lower().endswith(SOURCE_EXTENSIONS) or not os.path.isfile(path):
+            continue
+        entry = previous.get(name)
+        if entry is not None and _entry_is_current(entry, path, output_dir):
+            images[name] = entry
+        else:
+            todo.append(name)
+
+    unchanged = len(images)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {name: pool.submit(render_image, os.path.join(source_dir, name), output_dir) for name in todo}
+        for name, future in futures.items():
+            try:
+                images[name] = future.result()
+            except Exception:
+                logger.exception('Could not build variants of %s', name)
+                failed.append(name)
+
+    referenced = {MANIFEST_NAME}
+    for entry in images.values():
+        for files in entry['variants'].values():
+            referenced.update((files['jpeg'], files['webp']))
+    removed = 0
+    for name in os.listdir(output_dir):
+        if name not in referenced:
+            os.remove(os.path.join(output_dir, name))
+            removed += 1
+
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'variants': VARIANTS, 'images': dict(sorted(images.items()))}, f, indent=1)
+    return {'built': len(todo) - len(failed), 'unchanged': unchanged, 'removed': removed, 'failed': failed}
+
+
+def _entry_is_current(entry: dict, source_path: str, output_dir: str) -> bool:
+    if set(entry.get('variants', ())) != set(VARIANTS):
+        return False
+    with open(source_path, 'rb') as f:
+        if _digest(f.read(), 64) != entry.get('source_hash'):
+            return False
+    return all(os.path.exists(os.path.join(output_dir, files[fmt]))
+               for files in entry['variants'].values() for fmt in ('jpeg', 'webp'))
+
+
+class RecipeImage:
+    """URLs and intrinsic size of one image variant, for ``<picture>`` markup."""
+
+    __slots__ = ('url', 'webp', 'width', 'height')
+
+    def __init__(self, url: str, webp: Optional[str] = None, width: Optional[int] = None,
+                 height: Optional[int] = None):
+        self.url = url
+        self.webp = webp
+        self.width = width
+        self.height = height
+
+
+class ImageManifest:
+    """The loaded manifest; re-read when the file changes if ``reload`` is set (debug mode)."""
+
+    def __init__(self, path: str, reload: bool = False):
+        self.path = path
+        self.reload = reload
+        self._mtime = None
+        self._images = self._load()
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            self._mtime = os.stat(self.path).st_mtime
+        except OSError:
+            self._mtime = None
+        return load_manifest(self.path)
+
+    def images(self) -> Dict[str, dict]:
+        if self.reload:
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                mtime = None
+            if mtime != self._mtime:
+                self._images = self._load()
+        return self._images
+
+    def lookup(self, filename: Optional[str], variant: str = 'thumb') -> Optional[RecipeImage]:
+        if not filename:
+            return None
+        entry = self.images().get(filename)
+        files = entry['variants'].get(variant) if entry else None
+        if files is None:
+            return RecipeImage(url_for('static', filename=filename))
+        return RecipeImage(
+            url_for('derived_image', filename=files['jpeg']),
+            url_for('derived_image', filename=files['webp']),
+            files['width'], files['height'],
+        )
+
+
+def serve_derived(filename: str):
+    if filename == MANIFEST_NAME:
+        abort(404)
+    response = send_from_directory(DERIVED_DIR, filename, max_age=IMMUTABLE_MAX_AGE)
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app) -> None:
+    manifest = ImageManifest(os.path.join(DERIVED_DIR, MANIFEST_NAME), reload=app.debug)
+    app.extensions['recipe_images'] = manifest
+    app.add_url_rule('/static/derived/<path:filename>', 'derived_image', serve_derived)
+    app.add_template_global(manifest.lookup, 'recipe_image')
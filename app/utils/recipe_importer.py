@@ -0,0 +1,415 @@
+"""Streaming bulk import of recipe feeds.
+
+Records are parsed incrementally, so a feed never has to fit in memory. The
+supported formats are NDJSON (one recipe object per line), a JSON array of
+recipes, and the ``{"recipes": [...]}`` document used by ``data/recipes.json``.
+Records are written in batches, one transaction per batch:
+
+* ingredient names resolve against a map preloaded once; unknown names are
+  inserted in a single statement per batch;
+* recipes are upserted on their feed id (``Recipe.source_id``), so re-running
+  an import updates rows in place instead of duplicating them. Ratings are
+  user data and are never overwritten;
+* a recipe's ingredient rows are replaced with one executemany DELETE and one
+  executemany INSERT.
+
+Every recipe stores a hash of its source record (``Recipe.content_hash``).
+Records whose hash is unchanged are skipped entirely, and with
+``delete_missing`` the importer also deletes previously imported recipes
+that are no longer in the feed. Together these make a re-run a delta sync:
+``ImportStats`` lists the inserted, updated and deleted recipe ids. Batches
+with changes bump the catalog version and re-index only the changed recipes
+for search, since Core writes bypass the session events that normally do
+both. An unchanged feed touches nothing, so caches stay warm.
+"""
+import hashlib
+import json
+import logging
+import time
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, insert, null, select, update
+
+from app.extensions import db
+from app.models import (CookingHistory, DietaryStuff, Ingredient, Recipe, RecipeIngredient, UnitEnum,
+                        normalize_ingredient_name)
+from app.utils.db_dialect import upsert_insert
+from app.utils.recipe_catalog import bump_catalog_version
+from app.utils.recipe_search import sync_search_index
+from app.utils.unit_service import canonical_unit
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 1 << 16
+
+# Feed units stored as a different ingredient unit
+_INGREDIENT_UNITS = {'cup': UnitEnum.ml, 'pieces': UnitEnum.piece}
+
+# Columns an import may overwrite on an existing recipe
+RECIPE_FIELDS = ('name', 'description', 'servings', 'prep_time', 'cook_time', 'difficulty', 'cuisine',
+                 'diet_id', 'instructions', 'nutrition', 'image_url', 'content_hash')
+
+# Keeps IN lists well below SQLite's bound-parameter limit
+DELETE_CHUNK = 500
+
+
+def content_hash(record: dict) -> str:
+    """Stable hash of a source record, independent of key order and whitespace."""
+    canonical = json.dumps(record, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def ingredient_unit(unit: Optional[str]) -> UnitEnum:
+    """The unit a new ingredient is created with, for a feed unit string (piece if unknown)."""
+    unit = canonical_unit(unit) or 'piece'
+    if unit in _INGREDIENT_UNITS:
+        return _INGREDIENT_UNITS[unit]
+    try:
+        return UnitEnum(unit)
+    except ValueError:
+        return UnitEnum.piece
+
+
+def iter_records(fp: IO[str], read_size: int = READ_SIZE) -> Iterator[dict]:
+    """Yield recipe objects from a text stream without reading it whole."""
+    decoder = json.JSONDecoder()
+    buf = fp.read(read_size)
+    pos = 0
+    eof = not buf
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        more = fp.read(read_size)
+        if not more:
+            eof = True
+            return False
+        buf = buf[pos:] + more
+        pos = 0
+        return True
+
+    def skip(chars: str = ' \t\r\n') -> Optional[str]:
+        """Advance past ``chars``; return the next character, or None at end of input."""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not fill():
+                return None
+
+    def decode():
+        nonlocal pos
+        while True:
+            try:
+                value, pos = decoder.raw_decode(buf, pos)
+                return value
+            except json.JSONDecodeError:
+                if not fill():
+                    raise
+
+    first = skip()
+    if first is None:
+        return
+    if first == '{':
+        # The {"recipes": [...]} wrapper streams its array; anything else is NDJSON
+        while len(buf) - pos < 64 and fill():
+            pass
+        head = buf[pos + 1:pos + 64].lstrip()
+        if head.startswith('"recipes"') and head[len('"recipes"'):].lstrip().startswith(':'):
+            pos = buf.index(':', pos) + 1
+            first = skip()
+            if first != '[':
+                raise ValueError('"recipes" must be a list')
+    if first == '[':
+        pos += 1
+        if skip() == ']':
+            return
+        while True:
+            yield decode()
+            sep = skip()
+            if sep == ',':
+                pos += 1
+                skip()
+            elif sep == ']':
+                return
+            else:
+                raise ValueError(f'Malformed recipe list near offset {pos}')
+
+    while skip() is not None:
+        record = decode()
+        if isinstance(record, dict) and isinstance(record.get('recipes'), list):
+            yield from record['recipes']
+        else:
+            yield record
+
+
+def _batches(records: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ImportStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.recipes = 0
+        self.unchanged = 0
+        self.inserted_ids: List[int] = []
+        self.updated_ids: List[int] = []
+        self.deleted_ids: List[int] = []
+        self.ingredient_rows = 0
+        self.new_ingredients = 0
+        self.skipped = 0
+
+    @property
+    def changed_ids(self) -> List[int]:
+        """Ids of every recipe inserted, updated or deleted, for refreshing derived data."""
+        return sorted(set(self.inserted_ids) | set(self.updated_ids) | set(self.deleted_ids))
+
+    def changes(self) -> dict:
+        return {'inserted': sorted(self.inserted_ids), 'updated': sorted(self.updated_ids),
+                'deleted': sorted(self.deleted_ids)}
+
+    @property
+    def rows(self) -> int:
+        return self.recipes + self.ingredient_rows + self.new_ingredients
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f'{self.recipes} recipes ({len(self.inserted_ids)} new, {len(self.updated_ids)} updated, '
+                f'{self.unchanged} unchanged, {len(self.deleted_ids)} deleted, {self.skipped} skipped), '
+                f'{self.ingredient_rows} ingredient rows, {self.new_ingredients} new ingredients '
+                f'in {self.elapsed:.1f}s ({self.rows_per_second:,.0f} rows/s)')
+
+
+class RecipeImporter:
+    """Upserts batches of feed records; see the module docstring.
+
+    ``ratings`` returns an initial (rating_sum, rating_count) for recipes that
+    are new to the database. ``delete_missing`` is a source id prefix: after the
+    feed is consumed, imported recipes whose source id starts with it and that
+    the feed did not contain are deleted ('' covers every imported recipe;
+    recipes created in the app have no source id and are never touched).
+    """
+
+    def __init__(self, engine=None, batch_size: int = 1000,
+                 ratings: Optional[Callable[[dict], Tuple[int, int]]] = None,
+                 delete_missing: Optional[str] = None):
+        self.engine = engine if engine is not None else db.engine
+        self.batch_size = batch_size
+        self.ratings = ratings
+        self.delete_missing = delete_missing
+        self.ingredient_ids: Dict[str, int] = {}
+        self.diet_ids: Dict[str, int] = {}
+        self.recipe_ids: Dict[str, int] = {}
+        self.hashes: Dict[str, Optional[str]] = {}
+        self.seen = set()
+        # Recipes imported before source ids existed, adopted by name on first sight
+        self.legacy_ids: Dict[str, int] = {}
+        self.stats = ImportStats()
+
+    def preload(self, conn) -> None:
+        self.ingredient_ids = dict(conn.execute(select(Ingredient.normalized_name, Ingredient.id)).all())
+        self.diet_ids = {name.lower(): diet_id
+                         for diet_id, name in conn.execute(select(DietaryStuff.id, DietaryStuff.diet_name))}
+        rows = conn.execute(select(Recipe.id, Recipe.source_id, Recipe.name, Recipe.content_hash))
+        for recipe_id, source_id, name, stored_hash in rows:
+            if source_id is not None:
+                self.recipe_ids[source_id] = recipe_id
+                self.hashes[source_id] = stored_hash
+            else:
+                self.legacy_ids.setdefault(name, recipe_id)
+
+    def run(self, records: Iterable[dict], progress: Optional[Callable[[ImportStats], None]] = None) -> ImportStats:
+        with self.engine.begin() as conn:
+            self.preload(conn)
+        for batch in _batches(records, self.batch_size):
+            with self.engine.begin() as conn:
+                self.import_batch(conn, batch)
+            if progress is not None:
+                progress(self.stats)
+        if self.delete_missing is not None:
+            with self.engine.begin() as conn:
+                self.delete_unseen(conn, self.delete_missing)
+        return self.stats
+
+    def delete_unseen(self, conn, prefix: str) -> None:
+        """Delete imported recipes under ``prefix`` that the feed did not contain."""
+        if not self.seen:
+            # An empty or unreadable feed must not wipe the catalog
+            logger.warning('Feed contained no recipes; not deleting anything')
+            return
+        ids = [recipe_id for source_id, recipe_id in self.recipe_ids.items()
+               if source_id.startswith(prefix) and source_id not in self.seen]
+        if not ids:
+            return
+        history = CookingHistory.__table__
+        for start in range(0, len(ids), DELETE_CHUNK):
+            chunk = ids[start:start + DELETE_CHUNK]
+            # Cooking history outlives the recipe
+            conn.execute(update(history).where(history.c.recipe_id.in_(chunk)).values(recipe_id=null()))
+            conn.execute(delete(RecipeIngredient.__table__).where(RecipeIngredient.__table__.c.recipe_id.in_(chunk)))
+            conn.execute(delete(Recipe.__table__).where(Recipe.__table__.c.id.in_(chunk)))
+        bump_catalog_version(conn)
+        sync_search_index(ids, connection=conn)
+        deleted = set(ids)
+        for source_id in [s for s, recipe_id in self.recipe_ids.items() if recipe_id in deleted]:
+            del self.recipe_ids[source_id]
+            self.hashes.pop(source_id, None)
+        self.stats.deleted_ids.extend(ids)
+
+    def _resolve_ingredients(self, conn, names: Dict[str, UnitEnum]) -> None:
+        missing = {name: unit for name, unit in names.items() if name not in self.ingredient_ids}
+        if not missing:
+            return
+        table = Ingredient.__table__
+        rows = [{'name': name, 'normalized_name': name, 'unit': unit} for name, unit in missing.items()]
+        upsert = upsert_insert(conn)
+        if upsert is not None:
+            # Rows created concurrently are skipped here and picked up by the select below
+            inserted = conn.execute(upsert(table).on_conflict_do_nothing().returning(table.c.id), rows).all()
+            self.stats.new_ingredients += len(inserted)
+        else:
+            conn.execute(insert(table), rows)
+            self.stats.new_ingredients += len(rows)
+        found = conn.execute(
+            select(table.c.normalized_name, table.c.id).where(table.c.normalized_name.in_(list(missing)))
+        ).all()
+        self.ingredient_ids.update(found)
+
+    def import_batch(self, conn, records: List[dict]) -> None:
+        recipes: Dict[str, dict] = {}
+        requirements: Dict[str, Dict[str, Tuple[float, str]]] = {}
+        new_names: Dict[str, UnitEnum] = {}
+        for record in records:
+            source_id = record.get('id')
+            if not source_id or not record.get('name'):
+                logger.warning('Skipping recipe without id or name: %r', record.get('id') or record.get('name'))
+                self.stats.skipped += 1
+                continue
+            source_id = str(source_id)
+            self.seen.add(source_id)
+            digest = content_hash(record)
+            if source_id in self.hashes and self.hashes[source_id] == digest:
+                self.stats.recipes += 1
+                self.stats.unchanged += 1
+                continue
+            values = {field: record.get(field) for field in RECIPE_FIELDS}
+            values['servings'] = values['servings'] or 1
+            values['content_hash'] = digest
+            diet = record.get('diet')
+            values['diet_id'] = self.diet_ids.get(diet.lower()) if diet else None
+            if diet and values['diet_id'] is None:
+                logger.warning('Recipe %s has unknown diet %r', source_id, diet)
+            recipes[source_id] = values
+            lines: Dict[str, Tuple[float, str]] = {}
+            for ing in record.get('ingredients') or ():
+                name = normalize_ingredient_name(ing.get('name'))
+                unit = ing.get('unit') or 'piece'
+                if not name:
+                    continue
+                quantity = float(ing.get('quantity') or 0)
+                if name in lines and lines[name][1] == unit:
+                    quantity += lines[name][0]
+                elif name in lines:
+                    logger.warning('Recipe %s lists %s twice in different units; keeping the first', source_id, name)
+                    continue
+                lines[name] = (quantity, unit)
+                new_names.setdefault(name, ingredient_unit(unit))
+            requirements[source_id] = lines
+        if not recipes:
+            return
+
+        self._resolve_ingredients(conn, new_names)
+
+        table = Recipe.__table__
+        adopt = [
+            {'b_id': self.legacy_ids.pop(values['name']), 'b_source_id': source_id}
+            for source_id, values in recipes.items()
+            if source_id not in self.recipe_ids and values['name'] in self.legacy_ids
+        ]
+        if adopt:
+            conn.execute(
+                update(table).where(table.c.id == bindparam('b_id')).values(source_id=bindparam('b_source_id')),
+                adopt,
+            )
+            self.recipe_ids.update((row['b_source_id'], row['b_id']) for row in adopt)
+
+        existing = [source_id for source_id in recipes if source_id in self.recipe_ids]
+        fresh = [source_id for source_id in recipes if source_id not in self.recipe_ids]
+        if existing:
+            conn.execute(
+                update(table).where(table.c.source_id == bindparam('b_source_id'))
+                .values({field: bindparam(field) for field in RECIPE_FIELDS}),
+                [{'b_source_id': source_id, **recipes[source_id]} for source_id in existing],
+            )
+        if fresh:
+            rows = []
+            for source_id in fresh:
+                rating_sum, rating_count = self.ratings(recipes[source_id]) if self.ratings else (0, 0)
+                rows.append({'source_id': source_id, 'rating_sum': rating_sum, 'rating_count': rating_count,
+                             **recipes[source_id]})
+            upsert = upsert_insert(conn)
+            stmt = insert(table)
+            if upsert is not None:
+                # Another import may have created the row since preload
+                stmt = upsert(table)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[table.c.source_id],
+                    set_={field: stmt.excluded[field] for field in RECIPE_FIELDS},
+                )
+            conn.execute(stmt, rows)
+            self.recipe_ids.update(conn.execute(
+                select(table.c.source_id, table.c.id).where(table.c.source_id.in_(fresh))
+            ).all())
+
+        recipe_ids = [self.recipe_ids[source_id] for source_id in recipes]
+        ri = RecipeIngredient.__table__
+        conn.execute(delete(ri).where(ri.c.recipe_id == bindparam('b_recipe_id')),
+                     [{'b_recipe_id': recipe_id} for recipe_id in recipe_ids])
+        ingredient_rows = [
+            {'recipe_id': self.recipe_ids[source_id], 'ingredient_id': self.ingredient_ids[name],
+             'quantity': quantity, 'unit': unit, 'is_optional': False}
+            for source_id, lines in requirements.items()
+            for name, (quantity, unit) in lines.items()
+        ]
+        if ingredient_rows:
+            conn.execute(insert(ri), ingredient_rows)
+
+        bump_catalog_version(conn)
+        sync_search_index(recipe_ids, connection=conn)
+
+        self.hashes.update((source_id, values['content_hash']) for source_id, values in recipes.items())
+        self.stats.recipes += len(recipes)
+        self.stats.inserted_ids.extend(self.recipe_ids[source_id] for source_id in fresh)
+        self.stats.updated_ids.extend(self.recipe_ids[source_id] for source_id in existing)
+        self.stats.ingredient_rows += len(ingredient_rows)
+
+
+def import_recipes(fp: IO[str], batch_size: int = 1000, ratings=None, progress=None,
+                   delete_missing: Optional[str] = None) -> ImportStats:
+    """Stream-import recipes from ``fp`` (inside an app context)."""
+    return sync_recipes(iter_records(fp), batch_size=batch_size, ratings=ratings, progress=progress,
+                        delete_missing=delete_missing)
+
+
+def sync_recipes(records: Iterable[dict], batch_size: int = 1000, ratings=None, progress=None,
+                 delete_missing: Optional[str] = None) -> ImportStats:
+    """Apply a catalog of source records as a delta; see RecipeImporter."""
+    importer = RecipeImporter(batch_size=batch_size, ratings=ratings, delete_missing=delete_missing)
+    return importer.run(records, progress=progress)
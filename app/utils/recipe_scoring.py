@@ -0,0 +1,382 @@
+"""Scoring and ranking of the compiled recipe catalog against one user's inventory.
+
+Two interchangeable backends produce the same numbers and the same ordering:
+a pure Python loop over the catalog's CSR arrays, and an optional NumPy
+backend that treats the catalog as a sparse recipe x ingredient requirement
+matrix and scores every recipe with array operations. NumPy is used when it
+is installed unless ``RECOMMEND_BACKEND`` says otherwise.
+"""
+import heapq
+import threading
+from datetime import date
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from flask import current_app, has_app_context
+
+from app.utils.cache import LRUCache
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+HAS_NUMPY = np is not None
+
+# Days-to-expiry used for recipes whose ingredients never expire
+NO_EXPIRY_DAYS = 9999
+
+WEIGHT_INSUFFICIENT = 0.5
+WEIGHT_EXPIRY = 0.3
+WEIGHT_RATING = 0.2
+
+SORT_MODES = ('match', 'rating', 'expiry', 'weighted', 'all')
+
+
+class RecipeScores:
+    """Per-recipe scoring inputs for one user, indexed like ``catalog.recipes``."""
+
+    def __init__(self, catalog, insufficient_counts: Sequence[int], expiry_days: Sequence[int], backend: str):
+        self.catalog = catalog
+        self.insufficient_counts = insufficient_counts
+        self.expiry_days = expiry_days
+        self.backend = backend
+
+    def weighted_scores(self, rows: Optional[Sequence[int]] = None) -> Sequence[float]:
+        """0.5 * insufficient + 0.3 * expiry + 0.2 * (1 - rating), each normalized by its max.
+
+        With ``rows`` the scores (and the maxima they are normalized by) cover
+        only those catalog indices, aligned with ``rows``.
+        """
+        if self.backend == 'numpy':
+            return _weighted_numpy(self, rows)
+        return _weighted_python(self, rows)
+
+    def ranking(self, sort: str, limit: Optional[int] = None, candidates: Optional[Sequence[int]] = None) -> List[int]:
+        """Catalog indices ordered for the given sort mode (stable, like ``list.sort``).
+
+        With ``limit`` only the best ``limit`` recipes are selected, using a
+        partial top-K selection instead of sorting the whole catalog.
+        ``candidates`` (ascending catalog indices) restricts the ranking to a
+        subset, e.g. one diet, as if the catalog held only those recipes.
+        """
+        return self.ranked(sort, limit, candidates)[0]
+
+    def ranked(self, sort: str, limit: Optional[int] = None,
+               candidates: Optional[Sequence[int]] = None) -> Tuple[List[int], List[Optional[float]]]:
+        """Like ``ranking`` but also returns each recipe's score for the sort mode.
+
+        Scores are the insufficient count, average rating, days to expiry or
+        weighted score; ``None`` for sort modes that are not score based.
+        """
+        n = len(self.catalog.recipes) if candidates is None else len(candidates)
+        if limit is not None and limit >= n:
+            limit = None
+        if sort == 'all':
+            order = self.catalog.derived('name_order', _name_order)
+            if candidates is not None:
+                members = set(candidates)
+                order = [idx for idx in order if idx in members]
+            order = list(order[:limit])
+            return order, [None] * len(order)
+        if sort not in SORT_MODES:
+            rows = range(n) if candidates is None else candidates
+            order = list(rows[:limit])
+            return order, [None] * len(order)
+        if self.backend == 'numpy':
+            order, keys = _ranking_numpy(self, sort, limit, candidates)
+        else:
+            order, keys = _ranking_python(self, sort, limit, candidates)
+        if sort == 'rating':
+            keys = [-key for key in keys]
+        return order, keys
+
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    if backend is None:
+        backend = current_app.config.get('RECOMMEND_BACKEND', 'auto') if has_app_context() else 'auto'
+    if backend == 'auto':
+        return 'numpy' if HAS_NUMPY else 'python'
+    if backend == 'numpy' and not HAS_NUMPY:
+        raise RuntimeError('RECOMMEND_BACKEND is "numpy" but NumPy is not installed')
+    return backend
+
+
+def score_recipes(catalog, snapshot, today: Optional[date] = None, backend: Optional[str] = None) -> RecipeScores:
+    """Count insufficient ingredients and days to the earliest expiry for every recipe."""
+    today = today or date.today()
+    backend = resolve_backend(backend)
+    if backend == 'numpy':
+        return _score_numpy(catalog, snapshot, today)
+    return _score_python(catalog, snapshot, today)
+
+
+def _name_order(catalog) -> List[int]:
+    return sorted(range(len(catalog.recipes)), key=lambda i: catalog.recipes[i].name.lower())
+
+
+# --- pure Python backend ---
+
+def _score_one(catalog, idx: int, snapshot, today: date) -> Tuple[int, int]:
+    quantities = snapshot.quantities
+    count = 0
+    for ingredient_id, needed in catalog.requirements(idx):
+        if not quantities.get(ingredient_id, 0) >= needed:
+            count += 1
+    earliest = snapshot.earliest_expiry_for(catalog.recipe_ingredient_ids(idx))
+    return count, (earliest - today).days if earliest is not None else NO_EXPIRY_DAYS
+
+
+def _score_python(catalog, snapshot, today: date) -> RecipeScores:
+    insufficient_counts = []
+    expiry_days = []
+    for idx in range(len(catalog.recipes)):
+        count, days = _score_one(catalog, idx, snapshot, today)
+        insufficient_counts.append(count)
+        expiry_days.append(days)
+    return RecipeScores(catalog, insufficient_counts, expiry_days, 'python')
+
+
+def _weighted_python(scores: RecipeScores, rows: Optional[Sequence[int]] = None) -> List[float]:
+    recipes = scores.catalog.recipes
+    if rows is None:
+        rows = range(len(recipes))
+    counts = [scores.insufficient_counts[idx] for idx in rows]
+    days = [scores.expiry_days[idx] for idx in rows]
+    ratings = [recipes[idx].average_rating for idx in rows]
+    max_insufficient = max(counts, default=1)
+    max_expiry_days = max(days, default=1)
+    max_rating = max(ratings, default=5.0)
+
+    weighted = []
+    for count, expiry_days, rating in zip(counts, days, ratings):
+        insufficient_score = count / max_insufficient if max_insufficient > 0 else 0
+        expiry_score = expiry_days / max_expiry_days if max_expiry_days > 0 else 0
+        rating_score = 1 - (rating / max_rating) if max_rating > 0 else 0
+        weighted.append((WEIGHT_INSUFFICIENT * insufficient_score) + (WEIGHT_EXPIRY * expiry_score)
+                        + (WEIGHT_RATING * rating_score))
+    return weighted
+
+
+def _ranking_python(scores: RecipeScores, sort: str, limit: Optional[int],
+                    candidates: Optional[Sequence[int]]) -> Tuple[List[int], List[float]]:
+    rows = range(len(scores.catalog.recipes)) if candidates is None else candidates
+    if sort == 'match':
+        keys = [scores.insufficient_counts[idx] for idx in rows]
+    elif sort == 'rating':
+        recipes = scores.catalog.recipes
+        keys = [-recipes[idx].average_rating for idx in rows]
+    elif sort == 'expiry':
+        keys = [scores.expiry_days[idx] for idx in rows]
+    else:
+        keys = scores.weighted_scores(rows)
+    positions = range(len(keys))
+    if limit is None:
+        ordered = sorted(positions, key=keys.__getitem__)
+    else:
+        # nsmallest is stable too: equivalent to sorted(...)[:limit]
+        ordered = heapq.nsmallest(limit, positions, key=keys.__getitem__)
+    return [rows[pos] for pos in ordered], [keys[pos] for pos in ordered]
+
+
+# --- NumPy backend ---
+
+class _NumpyCatalog:
+    """The catalog as a sparse recipe x ingredient matrix in NumPy arrays."""
+
+    def __init__(self, catalog):
+        n = len(catalog.recipes)
+        self.offsets = np.asarray(catalog.offsets, dtype=np.int64)
+        ingredient_ids = np.asarray(catalog.ingredient_ids, dtype=np.int64)
+        self.column_ids, self.columns = np.unique(ingredient_ids, return_inverse=True)
+        self.column_of = {ingredient_id: col for col, ingredient_id in enumerate(self.column_ids.tolist())}
+        self.rows = np.repeat(np.arange(n, dtype=np.int64), np.diff(self.offsets))
+        self.needed = np.asarray(catalog.needed, dtype=np.float64)
+        self.ratings = np.array([r.average_rating for r in catalog.recipes], dtype=np.float64)
+        lengths = np.diff(self.offsets)
+        self.nonempty = lengths > 0
+        self.segment_starts = self.offsets[:-1][self.nonempty]
+        self.n = n
+
+
+def _score_numpy(catalog, snapshot, today: date) -> RecipeScores:
+    m = catalog.derived('numpy', _NumpyCatalog)
+    sentinel = np.iinfo(np.int64).max
+
+    available = np.zeros(len(m.column_ids), dtype=np.float64)
+    for ingredient_id, quantity in snapshot.quantities.items():
+        col = m.column_of.get(ingredient_id)
+        if col is not None:
+            available[col] = quantity
+    column_days = np.full(len(m.column_ids), sentinel, dtype=np.int64)
+    for ingredient_id, expiry_date in snapshot.earliest_expiry.items():
+        col = m.column_of.get(ingredient_id)
+        if col is not None:
+            column_days[col] = (expiry_date - today).days
+
+    insufficient = ~(available[m.columns] >= m.needed)
+    insufficient_counts = np.bincount(m.rows, weights=insufficient, minlength=m.n).astype(np.int64)
+
+    expiry_days = np.full(m.n, sentinel, dtype=np.int64)
+    if len(m.segment_starts):
+        expiry_days[m.nonempty] = np.minimum.reduceat(column_days[m.columns], m.segment_starts)
+    expiry_days[expiry_days == sentinel] = NO_EXPIRY_DAYS
+
+    return RecipeScores(catalog, insufficient_counts, expiry_days, 'numpy')
+
+
+def _weighted_numpy(scores: RecipeScores, rows: Optional[Sequence[int]] = None):
+    m = scores.catalog.derived('numpy', _NumpyCatalog)
+    counts = scores.insufficient_counts
+    days = scores.expiry_days
+    ratings = m.ratings
+    if rows is not None:
+        rows = np.asarray(rows, dtype=np.int64)
+        counts, days, ratings = counts[rows], days[rows], ratings[rows]
+    size = len(counts)
+    max_insufficient = counts.max() if size else 1
+    max_expiry_days = days.max() if size else 1
+    max_rating = ratings.max() if size else 5.0
+
+    insufficient_score = counts / max_insufficient if max_insufficient > 0 else np.zeros(size)
+    expiry_score = days / max_expiry_days if max_expiry_days > 0 else np.zeros(size)
+    rating_score = 1 - (ratings / max_rating) if max_rating > 0 else np.zeros(size)
+    return (WEIGHT_INSUFFICIENT * insufficient_score) + (WEIGHT_EXPIRY * expiry_score) + (WEIGHT_RATING * rating_score)
+
+
+def _ranking_numpy(scores: RecipeScores, sort: str, limit: Optional[int],
+                   candidates: Optional[Sequence[int]]) -> Tuple[List[int], List[float]]:
+    rows = None if candidates is None else np.asarray(candidates, dtype=np.int64)
+    if sort == 'match':
+        key = scores.insufficient_counts
+    elif sort == 'rating':
+        key = -scores.catalog.derived('numpy', _NumpyCatalog).ratings
+    elif sort == 'expiry':
+        key = scores.expiry_days
+    else:
+        key = scores.weighted_scores(rows)
+    if sort != 'weighted' and rows is not None:
+        key = key[rows]
+
+    if limit is None:
+        positions = np.argsort(key, kind='stable')
+    elif limit <= 0:
+        return [], []
+    else:
+        # Keep every recipe tied with the limit-th key so the stable order of ties survives
+        threshold = np.partition(key, limit - 1)[limit - 1]
+        tied = np.flatnonzero(key <= threshold)
+        positions = tied[np.argsort(key[tied], kind='stable')[:limit]]
+    keys = key[positions].tolist()
+    if rows is not None:
+        positions = rows[positions]
+    return positions.tolist(), keys
+
+
+# --- incremental per-user score tables ---
+
+class UserScoreTable:
+    """Scores of every catalog recipe for one user, kept current incrementally.
+
+    The table remembers the inventory it was computed from and the user's
+    ``inventory_version`` at that time. While the version is unchanged a refresh
+    returns the table as is, without loading the inventory. Otherwise only the
+    ingredients whose total quantity or earliest expiry changed are looked up in
+    the catalog's inverted index, and just the recipes using them are rescored.
+    The diff itself is O(pantry).
+
+    Refreshes never modify a ``RecipeScores`` that was handed out: the changed
+    rows are written to copies of its arrays and the new object is swapped in
+    under the lock, so a concurrent request can keep ranking the old one.
+    """
+
+    # Above this share of affected recipes a full (vectorized) rescore is cheaper
+    FULL_RESCORE_RATIO = 0.25
+
+    def __init__(self, catalog, snapshot, today: date, backend: str, inventory_version: Optional[int] = None):
+        self.lock = threading.Lock()
+        self.backend = backend
+        self._rebuild(catalog, snapshot, today, inventory_version)
+
+    def _rebuild(self, catalog, snapshot, today: date, inventory_version: Optional[int]) -> None:
+        self.scores = score_recipes(catalog, snapshot, today=today, backend=self.backend)
+        self.catalog_version = catalog.version
+        self.today = today
+        self.inventory_version = inventory_version
+        self.quantities = dict(snapshot.quantities)
+        self.earliest_expiry = dict(snapshot.earliest_expiry)
+
+    def changed_ingredients(self, snapshot) -> Set[int]:
+        changed = set()
+        for previous, current in ((self.quantities, snapshot.quantities),
+                                  (self.earliest_expiry, snapshot.earliest_expiry)):
+            for ingredient_id in previous.keys() | current.keys():
+                if previous.get(ingredient_id) != current.get(ingredient_id):
+                    changed.add(ingredient_id)
+        return changed
+
+    def refresh(self, catalog, load_snapshot: Callable, today: date,
+                inventory_version: Optional[int] = None) -> Tuple[RecipeScores, Dict[int, float]]:
+        """Current (scores, inventory quantities); ``load_snapshot`` is only called when they may have changed."""
+        with self.lock:
+            if catalog.version == self.catalog_version and today == self.today \
+                    and inventory_version is not None and inventory_version == self.inventory_version:
+                return self.scores, self.quantities
+
+            snapshot = load_snapshot()
+            if catalog.version != self.catalog_version or today != self.today:
+                self._rebuild(catalog, snapshot, today, inventory_version)
+                return self.scores, self.quantities
+
+            affected = set()
+            for ingredient_id in self.changed_ingredients(snapshot):
+                affected.update(catalog.recipes_using(ingredient_id))
+            if len(affected) > self.FULL_RESCORE_RATIO * len(catalog.recipes):
+                self._rebuild(catalog, snapshot, today, inventory_version)
+                return self.scores, self.quantities
+
+            if affected:
+                insufficient_counts = self.scores.insufficient_counts.copy()
+                expiry_days = self.scores.expiry_days.copy()
+                for idx in affected:
+                    insufficient_counts[idx], expiry_days[idx] = _score_one(catalog, idx, snapshot, today)
+                self.scores = RecipeScores(catalog, insufficient_counts, expiry_days, self.backend)
+            self.inventory_version = inventory_version
+            self.quantities = dict(snapshot.quantities)
+            self.earliest_expiry = dict(snapshot.earliest_expiry)
+            return self.scores, self.quantities
+
+
+class ScoreTableCache:
+    """Bounded LRU of per-user score tables for one app."""
+
+    def __init__(self, max_users: int):
+        self._tables = LRUCache(maxsize=max_users)
+
+    def scores_for(self, user_id: int, catalog, load_snapshot: Callable, inventory_version: Optional[int] = None,
+                   today: Optional[date] = None) -> Tuple[RecipeScores, Dict[int, float]]:
+        today = today or date.today()
+        backend = resolve_backend()
+        table = self._tables.get(user_id)
+        if table is None or table.backend != backend:
+            table = UserScoreTable(catalog, load_snapshot(), today, backend, inventory_version)
+            self._tables.set(user_id, table)
+            return table.scores, table.quantities
+        return table.refresh(catalog, load_snapshot, today, inventory_version)
+
+    def discard(self, user_id: int) -> None:
+        self._tables.pop(user_id)
+
+
+def get_user_scores(user_id: int, catalog, load_snapshot: Callable,
+                    inventory_version: Optional[int] = None) -> Tuple[RecipeScores, Dict[int, float]]:
+    """(scores, inventory quantities) for ``user_id``, updated incrementally from their previous request.
+
+    ``load_snapshot`` returns the user's InventorySnapshot; it is not called
+    while ``inventory_version`` matches the one the scores were computed for.
+    """
+    return current_app.extensions['recipe_score_tables'].scores_for(user_id, catalog, load_snapshot,
+                                                                    inventory_version)
+
+
+def init_app(app) -> None:
+    app.extensions['recipe_score_tables'] = ScoreTableCache(app.config.get('RECOMMEND_SCORE_TABLES', 1000))
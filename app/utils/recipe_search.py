@@ -0,0 +1,207 @@
+"""Recipe search backed by an SQLite FTS5 index.
+
+``recipe_fts`` indexes each recipe's name, description, cuisine and
+ingredient names under the recipe id (its rowid). Text matches are ranked
+with bm25 and combined with the indexed ``total_time``, ``difficulty`` and
+``diet_id`` filters on ``recipe``.
+
+The index is kept in sync by session events: every flush that touches a
+recipe, its ingredient rows or an ingredient name re-indexes the affected
+recipes inside the same transaction. Core bulk writes call
+``sync_search_index`` themselves. Backends without FTS5 fall back to LIKE.
+"""
+import re
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import bindparam, column, event, func, inspect, or_, select, table, text
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models import Ingredient, Recipe, RecipeIngredient
+
+FTS_TABLE = 'recipe_fts'
+
+# bm25 weights for name, description, cuisine, ingredients
+FTS_WEIGHTS = (10.0, 2.0, 4.0, 5.0)
+
+# Keeps IN lists well below SQLite's bound-parameter limit
+SYNC_CHUNK = 500
+
+_recipe_fts = table(FTS_TABLE, column('rowid'))
+
+_CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    "USING fts5(name, description, cuisine, ingredients, tokenize='unicode61 remove_diacritics 2')"
+)
+
+_INSERT_SQL = f"""
+    INSERT INTO {FTS_TABLE} (rowid, name, description, cuisine, ingredients)
+    SELECT r.id, r.name, coalesce(r.description, ''), coalesce(r.cuisine, ''),
+           coalesce((SELECT group_concat(i.name, ' ')
+                     FROM recipe_ingredient ri JOIN ingredient i ON i.id = ri.ingredient_id
+                     WHERE ri.recipe_id = r.id), '')
+    FROM recipe r
+"""
+
+# Engines known to have the FTS table; only positive results are cached so a
+# migration run by another process is picked up
+_ready_engines: Set[int] = set()
+
+
+class SearchResults:
+    def __init__(self, recipes: List[Recipe], total: int, mode: str):
+        self.recipes = recipes
+        self.total = total
+        self.mode = mode
+
+
+def fts_supported(connection) -> bool:
+    if connection.dialect.name != 'sqlite':
+        return False
+    options = {row[0] for row in connection.exec_driver_sql('PRAGMA compile_options')}
+    return 'ENABLE_FTS5' in options
+
+
+def search_index_exists(connection) -> bool:
+    key = id(connection.engine)
+    if key in _ready_engines:
+        return True
+    if connection.dialect.name != 'sqlite':
+        return False
+    found = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).first() is not None
+    if found:
+        _ready_engines.add(key)
+    return found
+
+
+def ensure_search_index(connection=None) -> bool:
+    """Create and fill the FTS table if it is missing; return whether FTS search is available.
+
+    Without a ``connection`` the table is built in a transaction of its own, so
+    it survives read-only requests that never commit.
+    """
+    conn = connection if connection is not None else db.session.connection()
+    if search_index_exists(conn):
+        return True
+    if not fts_supported(conn):
+        return False
+    if connection is None:
+        with db.engine.begin() as own:
+            own.exec_driver_sql(_CREATE_SQL)
+            if own.exec_driver_sql(f'SELECT count(*) FROM {FTS_TABLE}').scalar() == 0:
+                sync_search_index(connection=own)
+    else:
+        conn.exec_driver_sql(_CREATE_SQL)
+        sync_search_index(connection=conn)
+    _ready_engines.add(id(conn.engine))
+    return True
+
+
+def sync_search_index(recipe_ids: Optional[Iterable[int]] = None, connection=None) -> None:
+    """Re-index the given recipes (all when None) inside the caller's transaction.
+
+    Ids of deleted recipes are simply dropped from the index.
+    """
+    conn = connection if connection is not None else db.session.connection()
+    if not search_index_exists(conn) and recipe_ids is not None:
+        return
+    if recipe_ids is None:
+        conn.exec_driver_sql(f'DELETE FROM {FTS_TABLE}')
+        conn.exec_driver_sql(_INSERT_SQL)
+        return
+    ids = sorted(set(recipe_ids))
+    delete_stmt = text(f'DELETE FROM {FTS_TABLE} WHERE rowid IN :ids').bindparams(bindparam('ids', expanding=True))
+    insert_stmt = text(_INSERT_SQL + ' WHERE r.id IN :ids').bindparams(bindparam('ids', expanding=True))
+    for start in range(0, len(ids), SYNC_CHUNK):
+        chunk = ids[start:start + SYNC_CHUNK]
+        conn.execute(delete_stmt, {'ids': chunk})
+        conn.execute(insert_stmt, {'ids': chunk})
+
+
+def build_match_query(q: str) -> Optional[str]:
+    """Turn free text into an FTS5 query: every word must match, as a prefix."""
+    tokens = re.findall(r'\w+', q.lower())
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search_recipes(q: str = '', max_time: Optional[int] = None, difficulty: Optional[str] = None,
+                   diet_id: Optional[int] = None, page: int = 1, per_page: int = 24) -> SearchResults:
+    """Ranked text search combined with filters; one page of Recipe rows plus the total count."""
+    filters = []
+    if max_time is not None:
+        filters.append(Recipe.total_time <= max_time)
+    if difficulty:
+        filters.append(Recipe.difficulty == difficulty)
+    if diet_id is not None:
+        filters.append(Recipe.diet_id == diet_id)
+
+    match = build_match_query(q or '')
+    stmt = select(Recipe).where(*filters)
+    if match is None:
+        mode = 'filter'
+        stmt = stmt.order_by(Recipe.name, Recipe.id)
+    elif ensure_search_index():
+        mode = 'fts'
+        weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+        stmt = (
+            stmt.join(_recipe_fts, _recipe_fts.c.rowid == Recipe.id)
+            .where(text(f'{FTS_TABLE} MATCH :match').bindparams(match=match))
+            .order_by(text(f'bm25({FTS_TABLE}, {weights})'), Recipe.id)
+        )
+    else:
+        mode = 'like'
+        for token in re.findall(r'\w+', q.lower()):
+            pattern = f'%{token}%'
+            uses_ingredient = (
+                select(RecipeIngredient.recipe_id)
+                .join(Ingredient, Ingredient.id == RecipeIngredient.ingredient_id)
+                .where(RecipeIngredient.recipe_id == Recipe.id, Ingredient.name.ilike(pattern))
+                .exists()
+            )
+            stmt = stmt.where(or_(Recipe.name.ilike(pattern), Recipe.description.ilike(pattern),
+                                  Recipe.cuisine.ilike(pattern), uses_ingredient))
+        stmt = stmt.order_by(Recipe.name, Recipe.id)
+
+    total = db.session.execute(select(func.count()).select_from(stmt.order_by(None).subquery())).scalar()
+    recipes = db.session.execute(stmt.limit(per_page).offset((page - 1) * per_page)).scalars().all()
+    return SearchResults(recipes, total, mode)
+
+
+def _affected_recipe_ids(session: Session) -> Set[int]:
+    ids = set()
+    renamed = []
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Recipe):
+            ids.add(obj.id)
+        elif isinstance(obj, RecipeIngredient):
+            ids.add(obj.recipe_id)
+        elif isinstance(obj, Ingredient) and obj in session.dirty and inspect(obj).attrs.name.history.has_changes():
+            renamed.append(obj.id)
+    if renamed:
+        rows = session.connection().execute(
+            select(RecipeIngredient.recipe_id).where(RecipeIngredient.ingredient_id.in_(renamed)).distinct()
+        )
+        ids.update(row[0] for row in rows)
+    ids.discard(None)
+    return ids
+
+
+def _after_flush(session, flush_context):
+    if not any(isinstance(obj, (Recipe, RecipeIngredient, Ingredient))
+               for obj in list(session.new) + list(session.dirty) + list(session.deleted)):
+        return
+    conn = session.connection()
+    if not search_index_exists(conn):
+        return
+    ids = _affected_recipe_ids(session)
+    if ids:
+        sync_search_index(ids, connection=conn)
+
+
+def init_app(app) -> None:
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
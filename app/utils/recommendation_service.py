@@ -0,0 +1,88 @@
+"""Ranked recipe recommendations for a user, with a per-user result cache.
+
+Results are cached under (user, inventory version, catalog version, day, sort,
+diet filter). The inventory version is bumped on every inventory change, so a
+repeated view with unchanged inventory skips the snapshot query and scoring
+entirely.
+"""
+from datetime import date
+from typing import Dict, List, Optional
+
+from flask import current_app
+
+from app.utils.cache import LRUCache
+from app.utils.inventory_service import get_inventory_snapshot
+from app.utils.recipe_catalog import RecipeCatalog, get_catalog
+from app.utils.recipe_scoring import get_user_scores
+
+
+class RecommendationResult:
+    """The best-ranked recipes of one (user, inventory version, sort, diet) combination.
+
+    ``order`` holds the top ``len(order)`` catalog indices and ``scores`` their
+    sort-mode scores; ``complete`` says whether that is the whole (filtered)
+    catalog. ``quantities`` is the inventory the ranking was computed from,
+    used to build ingredient status.
+    """
+
+    def __init__(self, catalog: RecipeCatalog, order: List[int], scores: List[Optional[float]],
+                 insufficient_counts: List[int], quantities: Dict[int, float], total: int):
+        self.catalog = catalog
+        self.order = order
+        self.scores = scores
+        self.insufficient_counts = insufficient_counts
+        self.quantities = quantities
+        self.total = total
+
+    @property
+    def complete(self) -> bool:
+        return len(self.order) >= self.total
+
+    def covers(self, limit: Optional[int]) -> bool:
+        return self.complete or (limit is not None and limit <= len(self.order))
+
+    def entries(self, start: int = 0, stop: Optional[int] = None):
+        """Yield (catalog index, CatalogRecipe, insufficient count) for ranks start..stop."""
+        for pos in range(start, min(len(self.order), stop if stop is not None else len(self.order))):
+            idx = self.order[pos]
+            yield idx, self.catalog.recipes[idx], self.insufficient_counts[pos]
+
+    def missing_items(self, idx: int) -> List[dict]:
+        """Shortfall per insufficient ingredient of catalog recipe ``idx``."""
+        missing = []
+        for ingredient_id, needed in self.catalog.requirements(idx):
+            available = self.quantities.get(ingredient_id, 0)
+            if not available >= needed:
+                ingredient = self.catalog.ingredients[ingredient_id]
+                missing.append({'name': ingredient.name, 'missing': needed - available, 'unit': ingredient.unit})
+        return missing
+
+
+def get_recommendations(user, sort: str, diet_id: Optional[int] = None,
+                        limit: Optional[int] = None) -> RecommendationResult:
+    """Rank the catalog for ``user``; at least ``limit`` entries (all when None)."""
+    catalog = get_catalog()
+    cache: LRUCache = current_app.extensions['recommendation_cache']
+    key = (user.id, user.inventory_version, catalog.version, date.today(), sort, diet_id)
+    result = cache.get(key)
+    if result is not None and result.covers(limit):
+        return result
+
+    scores, quantities = get_user_scores(user.id, catalog, lambda: get_inventory_snapshot(user.id),
+                                         user.inventory_version)
+    candidates = catalog.recipes_with_diet(diet_id) if diet_id is not None else None
+    total = len(catalog) if candidates is None else len(candidates)
+    # Rank somewhat past the requested page so the next pages are served from the cache too
+    depth = None if limit is None else max(limit, current_app.config['RECOMMEND_CACHE_DEPTH'])
+    order, sort_scores = scores.ranked(sort, limit=depth, candidates=candidates)
+    counts = [int(scores.insufficient_counts[idx]) for idx in order]
+    result = RecommendationResult(catalog, order, sort_scores, counts, quantities, total)
+    cache.set(key, result)
+    return result
+
+
+def init_app(app) -> None:
+    app.extensions['recommendation_cache'] = LRUCache(
+        maxsize=app.config.get('RECOMMEND_CACHE_SIZE', 2048),
+        ttl=app.config.get('RECOMMEND_CACHE_TTL', 300),
+    )
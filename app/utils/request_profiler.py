@@ -0,0 +1,151 @@
+"""Opt-in per-request SQL profiler (``PROFILE_REQUESTS=1``).
+
+For every request it records the number of statements, the time spent in
+the database, the slowest statements and how often each statement shape
+repeated. The totals are sent back in a ``Server-Timing`` header (visible in
+the browser's network panel), the last ``PROFILER_HISTORY`` requests are kept
+in a ring buffer served as JSON at ``/_debug/requests`` to local clients,
+and a statement shape that runs more than ``PROFILER_REPEAT_THRESHOLD``
+times in one request is logged as a likely N+1 query, with the route.
+
+Statements are grouped by fingerprint: the SQL with whitespace collapsed
+and literals and expanded ``IN`` lists replaced, so the same query with
+different parameters counts as a repeat.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from typing import List, Optional
+
+from flask import current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+
+from app.extensions import db
+
+logger = logging.getLogger(__name__)
+
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*(?:\?|%\(\w+\)s|:\w+|[\d.]+|\'[^\']*\')\s*,?)+\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(statement: str) -> str:
+    sql = _SPACE.sub(' ', statement).strip()
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements: List[tuple] = []
+        self.fingerprints: Counter = Counter()
+
+    def record(self, statement: str, duration: float) -> None:
+        self.queries += 1
+        self.db_time += duration
+        self.statements.append((duration, statement))
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def summary(self, slowest: int, threshold: int) -> dict:
+        return {
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 2),
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 2),
+            'slowest': [
+                {'ms': round(duration * 1000, 2), 'sql': _SPACE.sub(' ', statement).strip()[:500]}
+                for duration, statement in sorted(self.statements, key=lambda s: s[0], reverse=True)[:slowest]
+            ],
+            'repeated': [
+                {'count': count, 'sql': sql[:500]}
+                for sql, count in self.fingerprints.most_common() if count > threshold
+            ],
+        }
+
+
+class ProfileHistory:
+    """Thread-safe ring buffer of request summaries, newest first."""
+
+    def __init__(self, size: int):
+        self._items = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, item: dict) -> None:
+        with self._lock:
+            self._items.appendleft(item)
+
+    def items(self) -> List[dict]:
+        with self._lock:
+            return list(self._items)
+
+
+def _current_profile() -> Optional[RequestProfile]:
+    return g.get('request_profile') if has_request_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile() is not None:
+        conn.info['profiler_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile()
+    started = conn.info.pop('profiler_started', None)
+    if profile is not None and started is not None:
+        profile.record(statement, time.perf_counter() - started)
+
+
+def _start_profile():
+    g.request_profile = RequestProfile()
+
+
+def _finish_profile(response):
+    profile = g.pop('request_profile', None)
+    if profile is None or request.endpoint == 'debug_requests':
+        return response
+    config = current_app.config
+    summary = profile.summary(config['PROFILER_SLOWEST'], config['PROFILER_REPEAT_THRESHOLD'])
+    summary['status'] = response.status_code
+    current_app.extensions['request_profiles'].add(summary)
+    for repeated in summary['repeated']:
+        logger.warning('Possible N+1 in %s %s (%s): %d x %s', summary['method'], summary['path'],
+                       summary['endpoint'], repeated['count'], repeated['sql'])
+    response.headers.add(
+        'Server-Timing',
+        f'db;dur={summary["db_ms"]};desc="{summary["queries"]} queries", app;dur={summary["total_ms"]}',
+    )
+    return response
+
+
+def debug_requests():
+    if request.remote_addr not in LOCAL_ADDRESSES:
+        return jsonify({'error': 'Not found'}), 404
+    return jsonify(current_app.extensions['request_profiles'].items())
+
+
+def init_app(app) -> None:
+    if not app.config.get('PROFILE_REQUESTS'):
+        return
+    app.config.setdefault('PROFILER_HISTORY', 100)
+    app.config.setdefault('PROFILER_SLOWEST', 5)
+    app.config.setdefault('PROFILER_REPEAT_THRESHOLD', 5)
+    app.extensions['request_profiles'] = ProfileHistory(app.config['PROFILER_HISTORY'])
+    with app.app_context():
+        engine = db.engine
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.add_url_rule('/_debug/requests', 'debug_requests', debug_requests)
@@ -0,0 +1,91 @@
+from typing import Dict, List, NamedTuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.extensions import db
+from app.models import Ingredient, ShoppingList, ShoppingListItem
+from app.utils.db_dialect import upsert_insert
+
+
+def get_or_create_list(user_id: int, name: str) -> ShoppingList:
+    """Return the user's shopping list called ``name``, creating (and flushing) it if needed."""
+    shopping_list = ShoppingList.query.filter_by(user_id=user_id, name=name).first()
+    if not shopping_list:
+        shopping_list = ShoppingList(user_id=user_id, name=name)
+        db.session.add(shopping_list)
+        db.session.flush()
+    return shopping_list
+
+
+class ConsolidatedItem(NamedTuple):
+    ingredient_id: int
+    name: str
+    unit: str
+    quantity: float
+    list_count: int
+
+
+def get_user_lists(user_id: int) -> List[ShoppingList]:
+    """The user's lists, newest first, with items and their ingredients loaded in two extra queries."""
+    return (
+        ShoppingList.query
+        .filter_by(user_id=user_id)
+        .options(selectinload(ShoppingList.items).joinedload(ShoppingListItem.ingredient))
+        .order_by(ShoppingList.created_at.desc())
+        .all()
+    )
+
+
+def consolidated_items(user_id: int) -> List[ConsolidatedItem]:
+    """Unpurchased quantities per ingredient summed across all of the user's lists.
+
+    Items are stored in their ingredient's own unit (see shopping.add_item and
+    recipes.cook), so the SQL sum is already in canonical units.
+    """
+    stmt = (
+        select(
+            Ingredient.id, Ingredient.name, Ingredient.unit,
+            func.sum(ShoppingListItem.quantity), func.count(ShoppingListItem.shopping_list_id),
+        )
+        .join(ShoppingList, ShoppingList.id == ShoppingListItem.shopping_list_id)
+        .join(Ingredient, Ingredient.id == ShoppingListItem.ingredient_id)
+        .where(ShoppingList.user_id == user_id, ShoppingListItem.is_purchased.is_not(True))
+        .group_by(Ingredient.id, Ingredient.name, Ingredient.unit)
+        .order_by(Ingredient.name)
+    )
+    return [
+        ConsolidatedItem(ingredient_id, name, unit.value if hasattr(unit, 'value') else unit, quantity, lists)
+        for ingredient_id, name, unit, quantity, lists in db.session.execute(stmt)
+    ]
+
+
+def add_items_to_list(list_id: int, quantities: Dict[int, float]) -> None:
+    """Add ingredient id -> quantity to a list, summing into items already on it.
+
+    Runs as a single INSERT ... ON CONFLICT DO UPDATE where the backend
+    supports it; nothing is committed here.
+    """
+    rows = [
+        {'shopping_list_id': list_id, 'ingredient_id': ingredient_id, 'quantity': qty, 'is_purchased': False}
+        for ingredient_id, qty in quantities.items() if qty > 0
+    ]
+    if not rows:
+        return
+    insert = upsert_insert(db.session.get_bind())
+    if insert is None:
+        for row in rows:
+            item = db.session.get(ShoppingListItem, (list_id, row['ingredient_id']))
+            if item:
+                item.quantity += row['quantity']
+            else:
+                db.session.add(ShoppingListItem(**row))
+        return
+
+    table = ShoppingListItem.__table__
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.shopping_list_id, table.c.ingredient_id],
+        set_={'quantity': table.c.quantity + stmt.excluded.quantity},
+    )
+    db.session.execute(stmt, rows)
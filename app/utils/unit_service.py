@@ -1,4 +1,9 @@
-from typing import Optional
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from app.models import normalize_ingredient_name
 
 MASS_UNITS = {
     'g': 1.0,
@@ -10,6 +15,8 @@ VOLUME_UNITS = {
     'l': 1000.0,
     'tbsp': 15.0,
     'tsp': 5.0,
+    'cup': 240.0,
+    'pinch': 0.3125,  # 1/16 tsp
 }
 
 COUNT_UNITS = {
@@ -17,12 +24,42 @@ COUNT_UNITS = {
     'pieces': 1.0,
 }
 
+# Countable units that are not interchangeable with a generic piece: a clove is
+# not a head of garlic. They convert through ingredient-specific piece weights.
+ITEM_UNITS = ('cloves', 'slices', 'head', 'leaves', 'stalks', 'sprigs')
+
 UNIT_CATEGORIES = {
     **{u: 'mass' for u in MASS_UNITS.keys()},
     **{u: 'volume' for u in VOLUME_UNITS.keys()},
     **{u: 'count' for u in COUNT_UNITS.keys()},
+    **{u: u for u in ITEM_UNITS},
+}
+
+UNIT_ALIASES = {
+    'gram': 'g', 'grams': 'g',
+    'kilogram': 'kg', 'kilograms': 'kg',
+    'milliliter': 'ml', 'milliliters': 'ml', 'millilitre': 'ml', 'millilitres': 'ml',
+    'liter': 'l', 'liters': 'l', 'litre': 'l', 'litres': 'l',
+    'tablespoon': 'tbsp', 'tablespoons': 'tbsp',
+    'teaspoon': 'tsp', 'teaspoons': 'tsp',
+    'cups': 'cup',
+    'pinches': 'pinch',
+    'pc': 'piece', 'pcs': 'piece',
+    'clove': 'cloves',
+    'slice': 'slices',
+    'heads': 'head',
+    'leaf': 'leaves',
+    'stalk': 'stalks',
+    'sprig': 'sprigs',
 }
 
+CONVERSION_DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+                                    'data', 'unit_conversions.json')
+
+
+class UnitConversionError(ValueError):
+    """Raised when a quantity cannot be expressed in the unit an ingredient is stored in."""
+
 
 def normalize_unit_string(unit: Optional[str]) -> Optional[str]:
     if unit is None:
@@ -30,27 +67,136 @@ def normalize_unit_string(unit: Optional[str]) -> Optional[str]:
     return unit.strip().lower()
 
 
-def convert_quantity(quantity: float, from_unit: str, to_unit: str) -> Optional[float]:
-    """Convert between supported units. Returns None if incompatible categories."""
-    from_unit = normalize_unit_string(from_unit)
-    to_unit = normalize_unit_string(to_unit)
-    if from_unit == to_unit:
+def canonical_unit(unit: Optional[str]) -> Optional[str]:
+    unit = normalize_unit_string(unit)
+    return UNIT_ALIASES.get(unit, unit)
+
+
+def _normalize_ingredient(ingredient: Optional[str]) -> Optional[str]:
+    return normalize_ingredient_name(ingredient) or None
+
+
+class ConversionTable:
+    """Unit conversion factors, compiled once and memoized per (from_unit, to_unit, ingredient).
+
+    Units of the same category convert through fixed factors. Mass and volume
+    convert through the ingredient's density, and countable units through the
+    ingredient's piece weights. Ingredients without that data do not convert
+    across categories: guessing water's density would silently be wrong for
+    flour, oil or honey.
+    """
+
+    def __init__(self, densities: Dict[str, float], piece_weights: Dict[str, Dict[str, float]]):
+        self.densities = {_normalize_ingredient(k): v for k, v in densities.items()}
+        self.piece_weights = {
+            _normalize_ingredient(k): {canonical_unit(u): w for u, w in weights.items()}
+            for k, weights in piece_weights.items()
+        }
+        self._factors: Dict[Tuple[str, str, Optional[str]], Optional[float]] = {}
+        self._base: Dict[str, Tuple[str, float]] = {}
+        for units, category in ((MASS_UNITS, 'mass'), (VOLUME_UNITS, 'volume'), (COUNT_UNITS, 'count')):
+            for unit, factor in units.items():
+                self._base[unit] = (category, factor)
+        for unit in ITEM_UNITS:
+            self._base[unit] = (unit, 1.0)
+
+    @classmethod
+    def from_file(cls, path: str = CONVERSION_DATA_PATH) -> 'ConversionTable':
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        return cls(data.get('densities_g_per_ml', {}), data.get('piece_weights_g', {}))
+
+    def _grams_per_unit(self, category: str, factor: float, ingredient: Optional[str]) -> Optional[float]:
+        if category == 'mass':
+            return factor
+        if category == 'volume':
+            density = self.densities.get(ingredient)
+            return factor * density if density is not None else None
+        weights = self.piece_weights.get(ingredient, {})
+        weight = weights.get('piece' if category == 'count' else category)
+        return weight * factor if weight is not None else None
+
+    def _compute(self, from_unit: str, to_unit: str, ingredient: Optional[str]) -> Optional[float]:
+        source = self._base.get(from_unit)
+        target = self._base.get(to_unit)
+        if source is None or target is None:
+            return None
+        if source[0] == target[0]:
+            return source[1] / target[1]
+        source_grams = self._grams_per_unit(source[0], source[1], ingredient)
+        target_grams = self._grams_per_unit(target[0], target[1], ingredient)
+        if source_grams is None or not target_grams:
+            return None
+        return source_grams / target_grams
+
+    def factor(self, from_unit: str, to_unit: str, ingredient: Optional[str] = None) -> Optional[float]:
+        """Multiplier taking a quantity in ``from_unit`` to ``to_unit``, or None if not convertible."""
+        from_unit = canonical_unit(from_unit)
+        to_unit = canonical_unit(to_unit)
+        if from_unit == to_unit:
+            return 1.0
+        ingredient = _normalize_ingredient(ingredient)
+        if ingredient not in self.densities and ingredient not in self.piece_weights:
+            ingredient = None
+        key = (from_unit, to_unit, ingredient)
+        try:
+            return self._factors[key]
+        except KeyError:
+            factor = self._factors[key] = self._compute(from_unit, to_unit, ingredient)
+            return factor
+
+
+_table: Optional[ConversionTable] = None
+_table_lock = threading.Lock()
+
+
+def get_conversion_table() -> ConversionTable:
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = ConversionTable.from_file()
+    return _table
+
+
+def convert_quantity(quantity: float, from_unit: str, to_unit: str, ingredient: Optional[str] = None) -> Optional[float]:
+    """Convert between supported units. Returns None if the units cannot be converted.
+
+    Passing the ingredient name enables density (mass <-> volume) and piece
+    weight (count <-> mass) conversions specific to that ingredient; without
+    them those conversions return None.
+    """
+    if normalize_unit_string(from_unit) == normalize_unit_string(to_unit):
         return quantity
+    factor = get_conversion_table().factor(from_unit, to_unit, ingredient)
+    return quantity * factor if factor is not None else None
 
-    from_cat = UNIT_CATEGORIES.get(from_unit)
-    to_cat = UNIT_CATEGORIES.get(to_unit)
-    if not from_cat or not to_cat or from_cat != to_cat:
-        return None
 
-    if from_cat == 'mass':
-        return quantity * (MASS_UNITS[from_unit] / MASS_UNITS[to_unit])
-    if from_cat == 'volume':
-        return quantity * (VOLUME_UNITS[from_unit] / VOLUME_UNITS[to_unit])
-    if from_cat == 'count':
-        return quantity * (COUNT_UNITS[from_unit] / COUNT_UNITS[to_unit])
-    return None
+def convert_many(quantities: Sequence[float], from_units: Union[str, Iterable[str]], to_unit: str,
+                 ingredient: Optional[str] = None) -> List[Optional[float]]:
+    """Batch form of convert_quantity for one target unit and ingredient.
+
+    ``from_units`` is either a single unit for all quantities or one unit per
+    quantity. Factors are looked up once per distinct source unit.
+    """
+    table = get_conversion_table()
+    if isinstance(from_units, str):
+        factor = table.factor(from_units, to_unit, ingredient)
+        return [q * factor if factor is not None else None for q in quantities]
+    factors: Dict[str, Optional[float]] = {}
+    converted = []
+    for quantity, unit in zip(quantities, from_units):
+        if unit not in factors:
+            factors[unit] = table.factor(unit, to_unit, ingredient)
+        factor = factors[unit]
+        converted.append(quantity * factor if factor is not None else None)
+    return converted
 
 
-def convert_recipe_to_ingredient_unit(recipe_qty: float, recipe_unit: str, ingredient_unit_value: str) -> Optional[float]:
+def convert_recipe_to_ingredient_unit(recipe_qty: float, recipe_unit: str, ingredient_unit_value: str,
+                                      ingredient: Optional[str] = None) -> Optional[float]:
     """Convert a recipe ingredient quantity (unit string) into the ingredient's canonical unit (enum .value)."""
-    return convert_quantity(recipe_qty, recipe_unit, ingredient_unit_value)
+    return convert_quantity(recipe_qty, recipe_unit, ingredient_unit_value, ingredient)
@@ -0,0 +1,99 @@
+"""Process-local cache behind Flask-Login's user loader.
+
+Authenticated requests used to start with ``SELECT ... FROM user``. The
+cache keeps each user's column values for a short TTL and rebuilds the
+instance from them, attaching it to the request's session with
+``merge(load=False)``, so no query is issued. Relationships still lazy-load
+as usual.
+
+Entries are dropped when a commit changes a ``User`` row through the ORM
+(password, diet, ...), when ``mark_user_changed`` was called for a Core
+update such as an inventory version bump, and on logout. Those only reach
+this process, so the browser session also carries a stamp that is rotated
+on every such change: an entry cached under another stamp is reloaded, so
+the user never sees stale data from a worker that missed the change. Changes
+made from another browser are bounded by the TTL.
+"""
+import secrets
+from typing import Optional
+
+from flask import current_app, has_app_context, has_request_context, session as flask_session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.extensions import db
+from app.models import User
+from app.utils.cache import LRUCache
+
+STAMP_KEY = '_user_stamp'
+
+
+def _cache():
+    return current_app.extensions.get('user_cache') if has_app_context() else None
+
+
+def _columns(user: User) -> dict:
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+
+def load_user(user_id: int) -> Optional[User]:
+    cache = _cache()
+    stamp = flask_session.get(STAMP_KEY) if has_request_context() else None
+    entry = cache.get(user_id) if cache is not None else None
+    if entry is not None and entry[0] == stamp:
+        user = User(**entry[1])
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+    user = db.session.get(User, user_id)
+    if user is not None and cache is not None:
+        cache.set(user_id, (stamp, _columns(user)))
+    return user
+
+
+def mark_user_changed(user_id: int, session: Optional[Session] = None) -> None:
+    """Drop the cached user once the current transaction commits (for Core updates of ``user``)."""
+    session = session if session is not None else db.session()
+    session.info.setdefault('users_changed', set()).add(user_id)
+
+
+def forget_user(user_id: int) -> None:
+    """Drop the cached user now, e.g. on logout."""
+    cache = _cache()
+    if cache is not None:
+        cache.pop(user_id)
+    if has_request_context():
+        flask_session.pop(STAMP_KEY, None)
+
+
+def _after_flush(session, flush_context):
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            mark_user_changed(obj.id, session)
+
+
+def _after_commit(session):
+    changed = session.info.pop('users_changed', None)
+    if not changed:
+        return
+    cache = _cache()
+    if cache is not None:
+        for user_id in changed:
+            cache.pop(user_id)
+    if has_request_context() and flask_session.get('_user_id') is not None \
+            and int(flask_session['_user_id']) in changed:
+        flask_session[STAMP_KEY] = secrets.token_hex(4)
+
+
+def _after_rollback(session):
+    session.info.pop('users_changed', None)
+
+
+def init_app(app) -> None:
+    app.extensions['user_cache'] = LRUCache(
+        maxsize=app.config.get('USER_CACHE_SIZE', 10000),
+        ttl=app.config.get('USER_CACHE_TTL', 60),
+    )
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+        event.listen(Session, 'after_commit', _after_commit)
+        event.listen(Session, 'after_rollback', _after_rollback)
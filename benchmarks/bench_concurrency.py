@@ -0,0 +1,152 @@
+"""Measure write throughput and lock errors with N processes writing at once.
+
+Builds a synthetic SQLite database (see benchmarks.synthetic), then starts
+``--workers`` processes. For ``--seconds``, each process plays one user,
+alternately cooking a recipe and toggling shopping list items through the
+app's own routes. Cooks cycle through the recipes that use the most of the
+user's stocked ingredients (see ``stocked_recipes``). Writes/s counts only
+requests that wrote: every toggle, and the cooks that changed the inventory
+(the growth of the user's ``inventory_version``). Cooks that found nothing
+left to deduct are reported separately. The run is repeated for every ``journal_mode:busy_timeout``
+profile given: ``delete:5000`` is SQLite's rollback journal with pysqlite's
+default 5 s timeout, ``delete:0`` reproduces "database is locked" failures,
+and ``wal:5000`` is the production profile.
+
+    python -m benchmarks.bench_concurrency
+    python -m benchmarks.bench_concurrency --workers 1 2 4 8 --seconds 5 --profiles delete:0 delete:5000 wal:5000
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from benchmarks.synthetic import add_arguments, create_synthetic_app, sizes_from_args
+
+
+def _worker(database: str, journal_mode: str, busy_timeout: int, user_id: int, seconds: float, barrier, results):
+    try:
+        results.put(_work(database, journal_mode, busy_timeout, user_id, seconds, barrier))
+    except Exception as exc:  # reported by the parent instead of leaving it waiting
+        barrier.abort()
+        results.put((0, 0, 0, [], f'{type(exc).__name__}: {exc}'))
+
+
+def _work(database, journal_mode, busy_timeout, user_id, seconds, barrier):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + database
+    os.environ['SQLITE_JOURNAL_MODE'] = journal_mode
+    os.environ['SQLITE_BUSY_TIMEOUT_MS'] = str(busy_timeout)
+    import logging
+    logging.disable(logging.CRITICAL)
+    from app import create_app
+    from app.extensions import db
+    from app.models import ShoppingList, ShoppingListItem, User
+    from benchmarks.synthetic import stocked_recipes
+
+    app = create_app('production')
+    with app.app_context():
+        recipes = stocked_recipes(db, user_id)
+        items = (
+            db.session.query(ShoppingListItem.shopping_list_id, ShoppingListItem.ingredient_id)
+            .join(ShoppingList).filter(ShoppingList.user_id == user_id).all()
+        )
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+    with app.app_context():
+        version_before = db.session.get(User, user_id).inventory_version
+
+    toggles = cooks = errors = 0
+    latencies = []
+    n = 0
+    # Every process has imported the app and is ready before the clock starts
+    barrier.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        cook = n % 2 == 0
+        if cook:
+            response = client.post(f'/recipes/{recipes[n // 2 % len(recipes)]}/cook')
+        else:
+            list_id, ingredient_id = items[n % len(items)]
+            response = client.post(f'/shopping/{list_id}/toggle/{ingredient_id}',
+                                   headers={'X-Requested-With': 'XMLHttpRequest'})
+        latencies.append(time.perf_counter() - started)
+        if response.status_code >= 500:
+            errors += 1
+        elif cook:
+            cooks += 1
+        else:
+            toggles += 1
+        n += 1
+
+    # Read once every process stopped writing, so the read cannot hit a lock
+    barrier.wait()
+    with app.app_context():
+        # Each cook that deducted anything bumped the version once; nothing else touches it here
+        cooked = db.session.get(User, user_id).inventory_version - version_before
+    return toggles + cooked, cooks - cooked, errors, latencies, None
+
+
+def run(database: str, workers: int, journal_mode: str, busy_timeout: int, seconds: float):
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    barrier = ctx.Barrier(workers)
+    processes = [
+        ctx.Process(target=_worker, args=(database, journal_mode, busy_timeout, user_id, seconds, barrier, results))
+        for user_id in range(1, workers + 1)
+    ]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    writes = sum(r[0] for r in collected)
+    noops = sum(r[1] for r in collected)
+    errors = sum(r[2] for r in collected)
+    for failure in {r[4] for r in collected if r[4]}:
+        print(f'worker failed: {failure}')
+    latencies = sorted(l for r in collected for l in r[3])
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0
+    return writes, noops, errors, p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.set_defaults(recipes=2000, users=16)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--profiles', nargs='+', default=['delete:5000', 'wal:5000'],
+                        help='journal_mode:busy_timeout_ms pairs to compare')
+    args = parser.parse_args()
+    if max(args.workers) > args.users:
+        parser.error('need at least as many --users as workers')
+
+    # The app reads DATABASE_URL once, so one template database is built and copied per run
+    template = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+    os.environ['SQLITE_JOURNAL_MODE'] = 'delete'
+    create_synthetic_app(template, **sizes_from_args(args))
+
+    print(f"{'profile':>12} {'workers':>7} {'writes/s':>9} {'no-ops':>7} {'errors':>7} {'p95 ms':>7}")
+    for profile in args.profiles:
+        journal_mode, busy_timeout = profile.split(':')
+        for workers in args.workers:
+            path = tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+            shutil.copyfile(template, path)
+            # Switched up front: changing journal mode needs the only connection to the file
+            with sqlite3.connect(path) as conn:
+                conn.execute(f'PRAGMA journal_mode = {journal_mode}')
+            writes, noops, errors, p95 = run(path, workers, journal_mode, int(busy_timeout), args.seconds)
+            print(f'{profile:>12} {workers:>7} {writes / args.seconds:>9.1f} {noops:>7} {errors:>7} {p95:>7.1f}')
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+    os.remove(template)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Time the meal planner on synthetic catalogs and check that it keeps its time budget.
+
+Runs without a database. For each catalog size it prints the score of the
+greedy plan and of the plan after local search, the number of plan
+evaluations and the wall time of a solve. Exits non-zero when
+a solve takes longer than the budget plus ``--tolerance``, so it can run in CI.
+The catalog's inverted ingredient index is built before timing, as it is
+built once per catalog and shared by every request.
+
+    python -m benchmarks.bench_meal_plan
+    python -m benchmarks.bench_meal_plan --sizes 100000 --pantry 1500 --budget 0.25
+"""
+import argparse
+import random
+import sys
+from datetime import date, timedelta
+
+from app.utils.meal_planner import MealPlanner
+from benchmarks.bench_scoring import build_catalog
+
+
+def build_lots(n_ingredients: int, pantry_size: int, today: date, rng: random.Random):
+    lots = []
+    for lot_id, ingredient_id in enumerate(rng.sample(range(1, n_ingredients + 1), min(pantry_size, n_ingredients))):
+        expiry = today + timedelta(days=rng.randint(-2, 30)) if rng.random() < 0.8 else None
+        lots.append((lot_id, ingredient_id, float(rng.choice((1, 5, 100, 300, 1000))), expiry))
+    lots.sort(key=lambda lot: (lot[3] is None, lot[3] or today, lot[0]))
+    return lots
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--ingredients', type=int, default=2000)
+    parser.add_argument('--pantry', type=int, default=150)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--budget', type=float, default=0.5, help='solve time budget in seconds')
+    parser.add_argument('--pool', type=int, default=300, help='candidate recipes considered')
+    parser.add_argument('--tolerance', type=float, default=0.05, help='seconds a solve may exceed the budget by')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    today = date.today()
+    over_budget = []
+    print(f"{'recipes':>8} {'greedy':>8} {'score':>8} {'evals':>7} {'ms':>7} {'timed out':>9}")
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        catalog = build_catalog(size, args.ingredients, rng)
+        lots = build_lots(args.ingredients, args.pantry, today, rng)
+        catalog.recipes_using(0)
+        plan = MealPlanner(catalog, lots, today=today).solve(args.days, args.budget, pool_size=args.pool)
+        print(f'{size:>8} {plan.greedy_score:>8.3f} {plan.score:>8.3f} {plan.evaluations:>7} '
+              f'{plan.elapsed * 1000:>7.1f} {str(plan.timed_out):>9}')
+        if plan.elapsed > args.budget + args.tolerance:
+            over_budget.append(size)
+    if over_budget:
+        print(f'Over the {args.budget}s budget for {", ".join(map(str, over_budget))} recipes')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
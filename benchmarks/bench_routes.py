@@ -0,0 +1,284 @@
+"""Time the hot routes and the importer; record the results as JSON for comparison across commits.
+
+Builds a synthetic database (see benchmarks.synthetic) and drives the app
+through Flask's test client, logged in as synthetic users. Every case is
+requested ``--warmup`` times untimed, then ``--iterations`` times, cycling
+through ``--bench-users`` users and through recipe ids. Each timed request
+records its latency and the number of SQL statements it ran. Per case, the
+results hold latency percentiles in milliseconds and the min/median/max
+statement count.
+
+The ``recommend[<sort>]`` cases drop the user's cached recommendations and
+score tables before every request, so they time a full ranking.
+``recommend[match,repeat]`` asks for the same page as one user over and over,
+which measures the cached path. ``cook`` cycles through the recipes that use
+the most of each user's stocked ingredients (most random recipes would
+deduct nothing), and its results count the cooks that changed the
+inventory. The importer is timed on a generated feed in three passes: the
+first import, an unchanged re-run, and a re-run where every tenth record
+changed.
+
+The JSON file also records the git commit, the data sizes and the settings.
+Pass a previous run's file as ``--compare`` to print the changes next to
+each case.
+
+    python -m benchmarks.bench_routes --output bench-routes.json
+    python -m benchmarks.bench_routes --recipes 50000 --users 500 --compare bench-routes.json --output new.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+from benchmarks.synthetic import add_arguments, create_synthetic_app, feed_records, sizes_from_args, stocked_recipes
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def percentile(sorted_values, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies, queries) -> dict:
+    latencies = sorted(latencies)
+    result = {'requests': len(latencies)}
+    for pct in PERCENTILES:
+        result[f'p{pct}_ms'] = round(percentile(latencies, pct) * 1000, 3)
+    result['mean_ms'] = round(statistics.fmean(latencies) * 1000, 3)
+    result['max_ms'] = round(latencies[-1] * 1000, 3)
+    result['queries'] = {'min': min(queries), 'median': statistics.median(queries), 'max': max(queries)}
+    return result
+
+
+def cases(recipe_ids, stocked):
+    """(name, method, url for request n and user, mode) for every timed route.
+
+    ``cycle`` rotates through the users, ``cold`` also drops their cached
+    recommendations first, ``repeat`` stays with the first user.
+    """
+    from app.utils.recipe_scoring import SORT_MODES
+
+    def recipe(n):
+        return recipe_ids[n * 7919 % len(recipe_ids)]
+
+    def cookable(n, user_id):
+        options = stocked[user_id] or recipe_ids
+        return options[n // len(stocked) % len(options)]
+
+    found = [(f'recommend[{sort}]', 'get', lambda n, user_id, sort=sort: f'/recipes/recommend?sort={sort}', 'cold')
+             for sort in SORT_MODES]
+    found += [
+        ('recommend[match,repeat]', 'get', lambda n, user_id: '/recipes/recommend?sort=match', 'repeat'),
+        ('detail', 'get', lambda n, user_id: f'/recipes/{recipe(n)}', 'cycle'),
+        ('inventory', 'get', lambda n, user_id: '/inventory/', 'cycle'),
+        ('shopping', 'get', lambda n, user_id: '/shopping/', 'cycle'),
+        # Last: cooking changes inventories and leaves flash messages in the session
+        ('cook', 'post', lambda n, user_id: f'/recipes/{cookable(n, user_id)}/cook', 'cycle'),
+    ]
+    return found
+
+
+def _client(app, user_id: int):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+    return client
+
+
+def _drop_recommendations(app, user_id: int) -> None:
+    app.extensions['recommendation_cache'].clear()
+    app.extensions['recipe_score_tables'].discard(user_id)
+
+
+def _inventory_version(engine, user_id: int) -> int:
+    from sqlalchemy import select
+
+    from app.models import User
+
+    with engine.connect() as conn:
+        return conn.execute(select(User.inventory_version).where(User.id == user_id)).scalar_one()
+
+
+def run_case(app, counter: QueryCounter, method: str, url, mode: str, user_ids, iterations: int, warmup: int,
+             engine=None):
+    """Time one case; with ``engine``, also count the requests that changed the user's inventory."""
+    if mode == 'repeat':
+        user_ids = user_ids[:1]
+    clients = {}
+    latencies, queries = [], []
+    writes = 0
+    for n in range(-warmup, iterations):
+        user_id = user_ids[n % len(user_ids)]
+        if user_id not in clients:
+            clients[user_id] = _client(app, user_id)
+        client = clients[user_id]
+        path = url(n, user_id)
+        if engine is not None:
+            version = _inventory_version(engine, user_id)
+        if mode == 'cold':
+            _drop_recommendations(app, user_id)
+        counter.count = 0
+        started = time.perf_counter()
+        response = getattr(client, method)(path)
+        elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise RuntimeError(f'{method.upper()} {path} returned {response.status_code}')
+        if n >= 0:
+            latencies.append(elapsed)
+            queries.append(counter.count)
+            if engine is not None and _inventory_version(engine, user_id) != version:
+                writes += 1
+    result = summarize(latencies, queries)
+    if engine is not None:
+        result['writes'] = writes
+    return result
+
+
+def run_importer(app, counter: QueryCounter, count: int, ingredients: int, seed: int) -> dict:
+    from app.utils.recipe_importer import import_recipes
+
+    results = {}
+    passes = (('import[insert]', 0), ('import[unchanged]', 0), ('import[update]', 1))
+    with app.app_context():
+        for name, revision in passes:
+            feed = io.StringIO(''.join(json.dumps(record) + '\n' for record in
+                                       feed_records(count, ingredients, seed=seed, revision=revision)))
+            counter.count = 0
+            started = time.perf_counter()
+            stats = import_recipes(feed)
+            elapsed = time.perf_counter() - started
+            results[name] = {
+                'records': stats.recipes, 'inserted': len(stats.inserted_ids), 'updated': len(stats.updated_ids),
+                'unchanged': stats.unchanged, 'seconds': round(elapsed, 3),
+                'records_per_second': round(stats.recipes / elapsed, 1) if elapsed else 0.0,
+                'queries': counter.count,
+            }
+    return results
+
+
+def git_commit() -> dict:
+    def git(*args):
+        return subprocess.run(('git',) + args, capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    head = git('rev-parse', 'HEAD')
+    if head.returncode != 0:
+        return {'commit': None, 'dirty': None}
+    return {'commit': head.stdout.strip(), 'dirty': bool(git('status', '--porcelain', '--untracked-files=no').stdout)}
+
+
+def _format_change(old, new) -> str:
+    if not old:
+        return ''
+    return f'{(new - old) / old * 100:+.0f}%'
+
+
+def print_results(results: dict, previous: dict) -> None:
+    print(f"{'case':<26} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'vs p50':>7} {'vs p95':>7}")
+    for name, result in results.items():
+        if 'p50_ms' not in result:
+            continue
+        old = previous.get(name, {})
+        print(f"{name:<26} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+              f"{result['queries']['median']:>8} {_format_change(old.get('p50_ms'), result['p50_ms']):>7} "
+              f"{_format_change(old.get('p95_ms'), result['p95_ms']):>7}")
+        if 'writes' in result:
+            print(f"{'':<26} {result['writes']} of {result['requests']} requests changed the inventory")
+        old_queries = old.get('queries', {}).get('median')
+        if old_queries is not None and old_queries != result['queries']['median']:
+            print(f"{'':<26} queries changed: {old_queries} -> {result['queries']['median']}")
+    for name, result in results.items():
+        if 'records_per_second' in result:
+            old = previous.get(name, {})
+            print(f"{name:<26} {result['records']} records in {result['seconds']:.2f}s "
+                  f"({result['records_per_second']:.0f}/s, {result['queries']} queries) "
+                  f"{_format_change(old.get('seconds'), result['seconds'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument('--iterations', type=int, default=50, help='timed requests per case')
+    parser.add_argument('--warmup', type=int, default=5, help='untimed requests per case')
+    parser.add_argument('--bench-users', type=int, default=20, help='users the requests cycle through')
+    parser.add_argument('--feed-recipes', type=int, default=5000, help='records in the importer feed (0 to skip)')
+    parser.add_argument('--database', help='SQLite file to (re)create; a temporary file by default')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='previous results file to compare against')
+    args = parser.parse_args()
+    if args.bench_users > args.users:
+        parser.error('--bench-users cannot exceed --users')
+
+    previous = {}
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)['results']
+
+    import logging
+    logging.disable(logging.WARNING)
+    database = args.database or tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+    print('Building synthetic database...')
+    app, counts = create_synthetic_app(database, **sizes_from_args(args))
+
+    from app.extensions import db
+    from app.models import Recipe
+
+    user_ids = list(range(1, args.bench_users + 1))
+    with app.app_context():
+        engine = db.engine
+        recipe_ids = [recipe_id for (recipe_id,) in db.session.query(Recipe.id).order_by(Recipe.id)]
+        stocked = {user_id: stocked_recipes(db, user_id) for user_id in user_ids}
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter)
+
+    results = {}
+    for name, method, url, mode in cases(recipe_ids, stocked):
+        results[name] = run_case(app, counter, method, url, mode, user_ids, args.iterations, args.warmup,
+                                 engine=engine if method == 'post' else None)
+    if args.feed_recipes:
+        results.update(run_importer(app, counter, args.feed_recipes, args.ingredients, args.seed))
+
+    print_results(results, previous)
+    report = {
+        **git_commit(),
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'sizes': counts,
+        'settings': {'iterations': args.iterations, 'warmup': args.warmup, 'bench_users': args.bench_users,
+                     'feed_recipes': args.feed_recipes, 'seed': args.seed},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+        print(f'Wrote {args.output}')
+    if not args.database:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(database + suffix):
+                os.remove(database + suffix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Compare the Python and NumPy recommendation scoring backends.
+
+Builds synthetic catalogs in memory (no database needed), checks that both
+backends return identical orderings for every sort mode (and that top-K
+selection matches the head of the full ranking) and prints the
+median time per request.
+
+    python -m benchmarks.bench_scoring
+    python -m benchmarks.bench_scoring --sizes 1000 10000 --repeat 3
+"""
+import argparse
+import random
+import statistics
+import time
+from array import array
+from collections import namedtuple
+from datetime import date, timedelta
+
+from app.utils.inventory_service import InventorySnapshot
+from app.utils.recipe_catalog import CatalogIngredient, CatalogRecipe, RecipeCatalog
+from app.utils.recipe_scoring import HAS_NUMPY, SORT_MODES, score_recipes
+
+RecipeRow = namedtuple('RecipeRow', 'id name description image_url servings prep_time cook_time '
+                                    'difficulty cuisine diet_id rating_sum rating_count')
+
+
+def build_catalog(n_recipes: int, n_ingredients: int, rng: random.Random) -> RecipeCatalog:
+    ingredients = {i: CatalogIngredient(i, f'ingredient {i}', 'g') for i in range(1, n_ingredients + 1)}
+    recipes = []
+    offsets = array('l', [0])
+    ingredient_ids = array('l')
+    needed = array('d')
+    for rid in range(1, n_recipes + 1):
+        rating_count = rng.randint(0, 40)
+        recipes.append(CatalogRecipe(RecipeRow(
+            rid, f'recipe {rng.randint(0, n_recipes)}', None, None, 4, rng.randint(5, 30), rng.randint(0, 60),
+            'easy', 'Any', None, rng.randint(rating_count, rating_count * 5), rating_count,
+        )))
+        for ingredient_id in sorted(rng.sample(range(1, n_ingredients + 1), rng.randint(3, 12))):
+            ingredient_ids.append(ingredient_id)
+            needed.append(float(rng.choice((1, 2, 50, 100, 200, 500))))
+        offsets.append(len(ingredient_ids))
+    return RecipeCatalog(1, recipes, ingredients, offsets, ingredient_ids, needed)
+
+
+def build_snapshot(n_ingredients: int, pantry_size: int, today: date, rng: random.Random) -> InventorySnapshot:
+    quantities = {}
+    earliest_expiry = {}
+    for ingredient_id in rng.sample(range(1, n_ingredients + 1), min(pantry_size, n_ingredients)):
+        quantities[ingredient_id] = float(rng.choice((1, 5, 100, 300, 1000)))
+        if rng.random() < 0.8:
+            earliest_expiry[ingredient_id] = today + timedelta(days=rng.randint(-2, 30))
+    return InventorySnapshot(quantities, earliest_expiry)
+
+
+def time_backend(catalog, snapshot, today, backend, sort, repeat):
+    timings = []
+    ranking = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        ranking = score_recipes(catalog, snapshot, today=today, backend=backend).ranking(sort)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), ranking
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--ingredients', type=int, default=2000)
+    parser.add_argument('--pantry', type=int, default=150)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=24, help='page size used to check top-K selection')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if not HAS_NUMPY:
+        raise SystemExit('NumPy is not installed; nothing to compare against.')
+
+    today = date.today()
+    print(f"{'recipes':>8} {'sort':>9} {'python ms':>10} {'numpy ms':>9} {'speedup':>8}")
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        catalog = build_catalog(size, args.ingredients, rng)
+        snapshot = build_snapshot(args.ingredients, args.pantry, today, rng)
+        # Compile the NumPy view outside the timed loop, as the app does once per catalog
+        score_recipes(catalog, snapshot, today=today, backend='numpy')
+        for sort in SORT_MODES:
+            if sort == 'all':
+                continue
+            py_time, py_order = time_backend(catalog, snapshot, today, 'python', sort, args.repeat)
+            np_time, np_order = time_backend(catalog, snapshot, today, 'numpy', sort, args.repeat)
+            if py_order != np_order:
+                raise SystemExit(f'Backends disagree on {sort!r} ordering for {size} recipes')
+            for backend in ('python', 'numpy'):
+                top = score_recipes(catalog, snapshot, today=today, backend=backend).ranking(sort, limit=args.top)
+                if top != py_order[:args.top]:
+                    raise SystemExit(f'{backend} top-{args.top} differs from the full {sort!r} ranking')
+            print(f'{size:>8} {sort:>9} {py_time * 1000:>10.1f} {np_time * 1000:>9.1f} {py_time / np_time:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
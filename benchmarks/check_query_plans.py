@@ -0,0 +1,135 @@
+"""Fail when a route's queries fall back to full scans of per-user tables.
+
+Builds a synthetic database (see benchmarks.synthetic), requests each hot
+route as one user, captures every statement it runs and asks SQLite for its
+``EXPLAIN QUERY PLAN``. A ``SCAN`` of any table in HOT_TABLES, which grow with
+the number of users, is a regression: those must be reached through an index
+(``SEARCH``). Scans of the recipe catalog tables are expected, since the
+catalog is compiled from them in full. The user's cached recommendations and
+score tables are dropped before every request, so no route is answered from
+memory, and a route that runs no statements at all is reported too, as it
+would otherwise pass unchecked. Exits non-zero on any violation, so it can
+run in CI.
+
+    python -m benchmarks.check_query_plans
+    python -m benchmarks.check_query_plans --recipes 2000 --users 50 --verbose
+"""
+import argparse
+import re
+import sys
+import tempfile
+
+from benchmarks.synthetic import add_arguments, create_synthetic_app, sizes_from_args
+
+HOT_TABLES = ('user', 'user_inventory', 'shopping_list', 'shopping_list_item', 'cooking_history')
+
+# (route, table) pairs allowed to scan, with the reason
+ALLOWED_SCANS = {}
+
+PLANNED_PREFIXES = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+
+def routes(recipe_id: int, list_id: int):
+    return [
+        ('get', '/recipes/recommend?sort=match', None),
+        ('get', '/recipes/recommend?sort=expiry&page=3', None),
+        ('get', f'/recipes/{recipe_id}', None),
+        ('get', f'/recipes/{recipe_id}/cook-check', None),
+        ('get', '/recipes/search?q=creamy+soup&max_time=45', None),
+        ('get', '/recipes/search?difficulty=easy&diet=2', None),
+        ('get', '/recipes/plan?days=7', None),
+        ('get', '/inventory/', None),
+        ('get', '/inventory/?q=ingredient+1', None),
+        ('get', '/shopping/', None),
+        ('get', '/shopping/consolidated', None),
+        ('get', '/api/recipes/recommend?limit=20', None),
+        ('post', '/api/recipes/cook-check', [recipe_id, recipe_id + 1]),
+        ('post', f'/shopping/{list_id}/add', {'ingredient_name': 'ingredient 7', 'quantity': '2', 'unit': 'g'}),
+        ('post', f'/recipes/{recipe_id}/cook?add_to_list=missing', None),
+    ]
+
+
+def scanned_tables(plan_rows):
+    """Tables read by a full scan in an EXPLAIN QUERY PLAN result."""
+    tables = set()
+    for row in plan_rows:
+        detail = row[-1]
+        match = re.match(r'SCAN (?:TABLE )?(\w+)', detail)
+        if match and 'COVERING INDEX' not in detail:
+            tables.add(match.group(1))
+    return tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument('--database', help='SQLite file to (re)create; a temporary file by default')
+    parser.add_argument('--verbose', action='store_true', help='print every plan')
+    args = parser.parse_args()
+
+    path = args.database or tempfile.NamedTemporaryFile(suffix='.db', delete=False).name
+    app, counts = create_synthetic_app(path, **sizes_from_args(args))
+    print(', '.join(f'{count} {name}' for name, count in counts.items()))
+
+    from sqlalchemy import event
+    from app.extensions import db
+    from app.models import ShoppingList
+
+    captured = []
+    with app.app_context():
+        engine = db.engine
+        list_id = db.session.query(ShoppingList.id).filter_by(user_id=1).first()[0]
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if not executemany and statement.lstrip().upper().startswith(PLANNED_PREFIXES):
+                captured.append((statement, parameters))
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+
+    violations = []
+    for method, url, body in routes(recipe_id=1, list_id=list_id):
+        app.extensions['recommendation_cache'].clear()
+        app.extensions['recipe_score_tables'].discard(1)
+        del captured[:]
+        if method == 'get':
+            response = client.get(url)
+        elif isinstance(body, dict):
+            response = client.post(url, data=body)
+        else:
+            response = client.post(url, json=body)
+        statements = list(captured)
+        if response.status_code >= 400:
+            violations.append(f'{method.upper()} {url}: HTTP {response.status_code}')
+        elif not statements:
+            violations.append(f'{method.upper()} {url}: no statements captured, nothing was checked')
+        with app.app_context():
+            raw = db.engine.raw_connection()
+            try:
+                cursor = raw.cursor()
+                for statement, parameters in statements:
+                    plan = cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+                    hot = {t for t in scanned_tables(plan) if t in HOT_TABLES and (url, t) not in ALLOWED_SCANS}
+                    if args.verbose or hot:
+                        print(f'{method.upper()} {url}\n  {" ".join(statement.split())[:200]}')
+                        for row in plan:
+                            print(f'    {row[-1]}')
+                    for table in sorted(hot):
+                        violations.append(f'{method.upper()} {url}: full scan of {table}')
+            finally:
+                raw.close()
+        print(f'{method.upper():4} {url:50} {response.status_code} {len(statements):>3} statements')
+
+    if violations:
+        print('\nQuery plan violations:', file=sys.stderr)
+        for violation in violations:
+            print(f'  {violation}', file=sys.stderr)
+        sys.exit(1)
+    print('\nNo full scans of per-user tables.')
+
+
+if __name__ == '__main__':
+    main()
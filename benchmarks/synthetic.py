@@ -0,0 +1,221 @@
+"""Generate a large synthetic EcoCook database for benchmarks and query-plan checks.
+
+Creates the schema with ``db.create_all()`` and fills it with Core bulk
+inserts: diets, ingredients, recipes with their ingredient rows, users with
+inventory lots, shopping lists and cooking history. Generation is
+deterministic for a given ``--seed``. ``feed_records`` produces recipe
+records in the import feed format, for timing the importer.
+
+    python -m benchmarks.synthetic --database /tmp/ecocook-synthetic.db
+    python -m benchmarks.synthetic --database /tmp/big.db --recipes 50000 --users 1000
+"""
+import argparse
+import os
+import random
+from datetime import date, datetime, timedelta
+from typing import List
+
+UNITS = ('g', 'ml', 'piece', 'tbsp', 'tsp')
+DIFFICULTIES = ('easy', 'medium', 'hard')
+CUISINES = ('Italian', 'Asian', 'Mexican', 'Indian', 'French', 'Greek', 'American', 'Middle Eastern')
+WORDS = ('roasted', 'spicy', 'creamy', 'quick', 'garden', 'smoky', 'lemon', 'herb', 'crispy', 'rustic',
+         'golden', 'summer', 'winter', 'classic', 'sweet', 'tangy')
+DISHES = ('soup', 'salad', 'stew', 'curry', 'pasta', 'bowl', 'tacos', 'risotto', 'stir fry', 'bake', 'wrap', 'pie')
+DIETS = ('Vegan', 'Vegetarian', 'Gluten-Free', 'High-Protein', 'Dairy-Free')
+
+# Rows per executemany batch
+BATCH = 5000
+
+
+def _insert(conn, table, rows):
+    for start in range(0, len(rows), BATCH):
+        conn.execute(table.insert(), rows[start:start + BATCH])
+
+
+def generate(db, recipes: int = 10000, ingredients: int = 2000, users: int = 200, lots: int = 60,
+             lists: int = 5, list_items: int = 8, history: int = 30, seed: int = 42) -> dict:
+    """Fill an empty database bound to ``db`` (inside an app context); return row counts."""
+    from app.models import (CookingHistory, DietaryStuff, Ingredient, Recipe, RecipeIngredient, ShoppingList,
+                            ShoppingListItem, User, UserInventory)
+    from app.utils.recipe_catalog import bump_catalog_version
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    today = date.today()
+    db.create_all()
+    with db.engine.begin() as conn:
+        _insert(conn, DietaryStuff.__table__, [
+            {'id': i, 'diet_name': name, 'diet_description': f'{name} recipes'} for i, name in enumerate(DIETS, 1)
+        ])
+        units = {i: rng.choice(UNITS) for i in range(1, ingredients + 1)}
+        _insert(conn, Ingredient.__table__, [
+            {'id': i, 'name': f'ingredient {i}', 'normalized_name': f'ingredient {i}', 'unit': unit,
+             'created_at': now}
+            for i, unit in units.items()
+        ])
+
+        recipe_rows, requirement_rows = [], []
+        for rid in range(1, recipes + 1):
+            rating_count = rng.randint(0, 60)
+            recipe_rows.append({
+                'id': rid,
+                'name': f'{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(DISHES)} {rid}',
+                'description': f'A {rng.choice(WORDS)} {rng.choice(DISHES)} from the {rng.choice(CUISINES)} kitchen.',
+                'servings': rng.choice((1, 2, 4, 6)),
+                'prep_time': rng.randint(5, 40),
+                'cook_time': rng.randint(0, 90),
+                'difficulty': rng.choice(DIFFICULTIES),
+                'cuisine': rng.choice(CUISINES),
+                'diet_id': rng.choice((None, None, 1, 2, 3, 4, 5)),
+                'instructions': [f'Step {n}: {rng.choice(WORDS)} and stir.' for n in range(1, rng.randint(3, 8))],
+                'nutrition': {'calories': rng.randint(150, 900), 'protein': rng.randint(2, 60)},
+                'rating_sum': rng.randint(rating_count, rating_count * 5),
+                'rating_count': rating_count,
+                'created_at': now,
+            })
+            for ingredient_id in rng.sample(range(1, ingredients + 1), rng.randint(3, 12)):
+                requirement_rows.append({
+                    'recipe_id': rid, 'ingredient_id': ingredient_id,
+                    'quantity': float(rng.choice((1, 2, 50, 100, 200, 500))), 'unit': units[ingredient_id],
+                    'is_optional': False,
+                })
+        _insert(conn, Recipe.__table__, recipe_rows)
+        _insert(conn, RecipeIngredient.__table__, requirement_rows)
+
+        _insert(conn, User.__table__, [
+            {'id': uid, 'email': f'user{uid}@example.com', 'password_hash': 'x', 'created_at': now,
+             'inventory_version': 0}
+            for uid in range(1, users + 1)
+        ])
+        lot_rows, list_rows, item_rows, history_rows = [], [], [], []
+        list_id = 0
+        for uid in range(1, users + 1):
+            for ingredient_id in rng.sample(range(1, ingredients + 1), min(lots, ingredients)):
+                lot_rows.append({
+                    'user_id': uid, 'ingredient_id': ingredient_id,
+                    'quantity': float(rng.choice((1, 5, 100, 300, 1000))),
+                    'expiry_date': today + timedelta(days=rng.randint(-3, 45)) if rng.random() < 0.85 else None,
+                    'created_at': now, 'updated_at': now,
+                })
+            for n in range(lists):
+                list_id += 1
+                list_rows.append({'id': list_id, 'user_id': uid, 'name': f'list {n}',
+                                  'created_at': now - timedelta(days=n), 'updated_at': now, 'is_completed': False})
+                for ingredient_id in rng.sample(range(1, ingredients + 1), min(list_items, ingredients)):
+                    item_rows.append({'shopping_list_id': list_id, 'ingredient_id': ingredient_id,
+                                      'quantity': float(rng.randint(1, 500)), 'is_purchased': rng.random() < 0.3,
+                                      'created_at': now})
+            for n in range(history):
+                history_rows.append({'user_id': uid, 'recipe_id': rng.randint(1, recipes), 'quantity_used': 1.0,
+                                     'cooking_date': now - timedelta(days=n), 'carbon_saved': rng.random()})
+        _insert(conn, UserInventory.__table__, lot_rows)
+        _insert(conn, ShoppingList.__table__, list_rows)
+        _insert(conn, ShoppingListItem.__table__, item_rows)
+        _insert(conn, CookingHistory.__table__, history_rows)
+        bump_catalog_version(conn)
+        # Planner statistics, as a long-lived production database would have
+        conn.exec_driver_sql('ANALYZE')
+
+    return {'recipes': recipes, 'recipe_ingredients': len(requirement_rows), 'ingredients': ingredients,
+            'users': users, 'inventory': len(lot_rows), 'shopping_lists': len(list_rows),
+            'shopping_items': len(item_rows), 'cooking_history': len(history_rows)}
+
+
+def feed_records(count: int, ingredients: int = 2000, seed: int = 42, prefix: str = 'synthetic:',
+                 revision: int = 0) -> List[dict]:
+    """Recipe records in the importer's feed format, naming the generated ingredients.
+
+    Records are identical for the same arguments; a different ``revision``
+    changes the description of every tenth record, so a re-import has updates.
+    """
+    rng = random.Random(seed)
+    records = []
+    for n in range(1, count + 1):
+        dish = rng.choice(DISHES)
+        description = f'A {rng.choice(WORDS)} {dish} from the {rng.choice(CUISINES)} kitchen.'
+        if revision and n % 10 == 0:
+            description += f' (revision {revision})'
+        records.append({
+            'id': f'{prefix}{n}',
+            'name': f'{rng.choice(WORDS)} {rng.choice(WORDS)} {dish} (imported {n})',
+            'description': description,
+            'servings': rng.choice((1, 2, 4, 6)),
+            'prep_time': rng.randint(5, 40),
+            'cook_time': rng.randint(0, 90),
+            'difficulty': rng.choice(DIFFICULTIES),
+            'cuisine': rng.choice(CUISINES),
+            'diet': rng.choice((None, None) + DIETS),
+            'ingredients': [
+                {'name': f'ingredient {i}', 'quantity': rng.choice((1, 2, 50, 100, 200, 500)),
+                 'unit': rng.choice(UNITS)}
+                for i in rng.sample(range(1, ingredients + 1), rng.randint(3, 12))
+            ],
+            'instructions': [f'Step {step}: {rng.choice(WORDS)} and stir.' for step in range(1, rng.randint(3, 8))],
+            'nutrition': {'calories': rng.randint(150, 900), 'protein': rng.randint(2, 60)},
+        })
+    return records
+
+
+def stocked_recipes(db, user_id: int, limit: int = 50) -> List[int]:
+    """Ids of the recipes that use the most ingredients ``user_id`` has in stock, so cooking them writes.
+
+    Random pantries cover few of a recipe's ingredients, so most recipes picked
+    at random would deduct nothing.
+    """
+    from sqlalchemy import func, select
+
+    from app.models import RecipeIngredient, UserInventory
+
+    stocked = func.count(func.distinct(RecipeIngredient.ingredient_id))
+    rows = db.session.execute(
+        select(RecipeIngredient.recipe_id)
+        .join(UserInventory, UserInventory.ingredient_id == RecipeIngredient.ingredient_id)
+        .where(UserInventory.user_id == user_id, UserInventory.quantity > 0)
+        .group_by(RecipeIngredient.recipe_id)
+        .order_by(stocked.desc(), RecipeIngredient.recipe_id)
+        .limit(limit)
+    )
+    return list(rows.scalars())
+
+
+def create_synthetic_app(path: str, **sizes):
+    """Build a fresh synthetic SQLite database at ``path`` and return an app bound to it."""
+    if os.path.exists(path):
+        os.remove(path)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(path)
+    from app import create_app
+    from app.extensions import db
+
+    app = create_app('production')
+    with app.app_context():
+        counts = generate(db, **sizes)
+    return app, counts
+
+
+def add_arguments(parser):
+    parser.add_argument('--recipes', type=int, default=10000)
+    parser.add_argument('--ingredients', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--lots', type=int, default=60, help='inventory lots per user')
+    parser.add_argument('--lists', type=int, default=5, help='shopping lists per user')
+    parser.add_argument('--list-items', type=int, default=8, help='items per shopping list')
+    parser.add_argument('--history', type=int, default=30, help='cooking history rows per user')
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def sizes_from_args(args) -> dict:
+    return {'recipes': args.recipes, 'ingredients': args.ingredients, 'users': args.users, 'lots': args.lots,
+            'lists': args.lists, 'list_items': args.list_items, 'history': args.history, 'seed': args.seed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database', default='ecocook-synthetic.db', help='SQLite file to (re)create')
+    add_arguments(parser)
+    args = parser.parse_args()
+    _, counts = create_synthetic_app(args.database, **sizes_from_args(args))
+    print(', '.join(f'{count} {name}' for name, count in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
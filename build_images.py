@@ -0,0 +1,29 @@
+"""Build resized JPEG/WebP variants of the recipe images in app/static (requires Pillow).
+
+    python build_images.py
+    python build_images.py --workers 4 --force
+"""
+import argparse
+import sys
+import time
+
+from app.utils.recipe_images import DERIVED_DIR, build_derivatives
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--force', action='store_true', help='rebuild images whose source is unchanged')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = build_derivatives(workers=args.workers, force=args.force)
+    print(f"{counts['built']} built, {counts['unchanged']} unchanged, {counts['removed']} stale files removed "
+          f"in {time.perf_counter() - started:.1f}s -> {DERIVED_DIR}")
+    if counts['failed']:
+        print(f"{len(counts['failed'])} failed (see the log): {', '.join(counts['failed'])}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
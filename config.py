@@ -5,11 +5,79 @@ load_dotenv()
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+
+def production_engine_options(uri):
+    """Pooling and timeouts for server databases; SQLite is tuned with pragmas instead (app/utils/db_engine.py)."""
+    if uri.startswith('sqlite'):
+        return {}
+    options = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE') or 10),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW') or 20),
+        # Seconds to wait for a pooled connection before failing the request
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT') or 10),
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+    }
+    if uri.startswith('postgresql'):
+        statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS') or 5000)
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    return options
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'ecocook.db')
+    # Seconds between checks of the persisted recipe catalog version
+    RECIPE_CATALOG_CHECK_INTERVAL = float(os.environ.get('RECIPE_CATALOG_CHECK_INTERVAL') or 5)
+    # 'auto' uses NumPy for recommendation scoring when installed, else 'numpy' or 'python'
+    RECOMMEND_BACKEND = os.environ.get('RECOMMEND_BACKEND') or 'auto'
+    RECOMMEND_PER_PAGE = 24
+    # Users whose incremental recommendation score tables are kept in memory
+    RECOMMEND_SCORE_TABLES = 1000
+    # Cached ranked results, keyed by user, inventory version, sort and diet filter
+    RECOMMEND_CACHE_SIZE = 2048
+    RECOMMEND_CACHE_TTL = 300
+    RECOMMEND_CACHE_DEPTH = 96
+    API_RECOMMEND_LIMIT = 50
+    API_RECOMMEND_MAX_LIMIT = 500
+    # Recipes accepted by one batch feasibility check
+    API_COOK_CHECK_MAX_RECIPES = 100
+    RECOMMEND_MAX_PER_PAGE = 100
+    # Meal planner: seconds of solving per plan, longest plan and recipes considered
+    MEAL_PLAN_TIME_BUDGET = float(os.environ.get('MEAL_PLAN_TIME_BUDGET') or 0.5)
+    MEAL_PLAN_MAX_DAYS = 14
+    MEAL_PLAN_CANDIDATES = 300
+    SEARCH_PER_PAGE = 24
+    INVENTORY_PER_PAGE = 50
+    # Process-local ingredient name -> id cache; the TTL bounds staleness across processes
+    INGREDIENT_CACHE_SIZE = 10000
+    INGREDIENT_CACHE_TTL = 3600
+    # Users served by the login loader without a query; the TTL bounds staleness across processes
+    USER_CACHE_SIZE = 10000
+    USER_CACHE_TTL = 60
+    # Per-request SQL profiling: Server-Timing header, /_debug/requests and N+1 warnings
+    PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS', '').lower() in ('1', 'true', 'yes')
+    PROFILER_HISTORY = 100
+    PROFILER_SLOWEST = 5
+    # A statement shape repeated more often than this in one request is logged as a likely N+1
+    PROFILER_REPEAT_THRESHOLD = 5
+    # Part of every page ETag; derived from the template files when unset
+    ETAG_VERSION = os.environ.get('ETAG_VERSION')
+    # Expiry alerts (notify_expiring.py): lots expiring within DAYS, or that expired at most LOOKBACK_DAYS ago
+    EXPIRY_NOTIFY_DAYS = int(os.environ.get('EXPIRY_NOTIFY_DAYS') or 3)
+    EXPIRY_NOTIFY_LOOKBACK_DAYS = 2
+    # 'file' appends digests to EXPIRY_NOTIFY_FILE as JSON lines; 'smtp' mails them through MAIL_SERVER
+    EXPIRY_NOTIFIER = os.environ.get('EXPIRY_NOTIFIER') or 'file'
+    EXPIRY_NOTIFY_FILE = os.environ.get('EXPIRY_NOTIFY_FILE') or os.path.join(basedir, 'expiry-notifications.ndjson')
+    # The defaults reach a local debugging server (python -m aiosmtpd -n)
+    MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'localhost'
+    MAIL_PORT = int(os.environ.get('MAIL_PORT') or 1025)
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', '').lower() in ('1', 'true', 'yes')
+    MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
+    MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_SENDER = os.environ.get('MAIL_SENDER') or 'EcoCook <noreply@ecocook.local>'
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -23,6 +91,17 @@ class TestingConfig(Config):
 class ProductionConfig(Config):
     DEBUG = False
     SQLALCHEMY_ECHO = False
+    SQLALCHEMY_ENGINE_OPTIONS = production_engine_options(Config.SQLALCHEMY_DATABASE_URI)
+    # Applied to every new SQLite connection (app/utils/db_engine.py); development and testing keep
+    # SQLite's defaults. WAL lets readers run alongside the single writer, and writers wait up to
+    # busy_timeout for the lock instead of failing with "database is locked"
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE') or 'wal',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS') or 5000),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS') or 'normal',
+        'cache_size': -16000,  # KiB
+        'temp_store': 'memory',
+    }
 
 config = {
     'development': DevelopmentConfig,
@@ -0,0 +1,30 @@
+"""catalog version counter
+
+Revision ID: 3f6a2c91b7d4
+Revises: d0b9b8710501
+Create Date: 2026-10-18 10:12:04.518233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6a2c91b7d4'
+down_revision = 'd0b9b8710501'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    catalog_version = op.create_table('catalog_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(catalog_version, [{'id': 1, 'version': 1}])
+
+
+def downgrade():
+    op.drop_table('catalog_version')
@@ -0,0 +1,42 @@
+"""ingredient normalized name
+
+Revision ID: 5e2f9c4d8a13
+Revises: b7e4d2a61c35
+Create Date: 2026-10-18 16:48:12.305117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2f9c4d8a13'
+down_revision = 'b7e4d2a61c35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ingredient', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('normalized_name', sa.String(length=100), nullable=True))
+
+    # Same rule as app.models.normalize_ingredient_name
+    ingredient = sa.table('ingredient', sa.column('id', sa.Integer), sa.column('name', sa.String),
+                          sa.column('normalized_name', sa.String))
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(ingredient.c.id, ingredient.c.name)).all()
+    if rows:
+        bind.execute(
+            ingredient.update().where(ingredient.c.id == sa.bindparam('ingredient_id'))
+            .values(normalized_name=sa.bindparam('normalized')),
+            [{'ingredient_id': row.id, 'normalized': ' '.join(row.name.lower().split())} for row in rows],
+        )
+
+    with op.batch_alter_table('ingredient', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ingredient_normalized_name'), ['normalized_name'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ingredient', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ingredient_normalized_name'))
+        batch_op.drop_column('normalized_name')
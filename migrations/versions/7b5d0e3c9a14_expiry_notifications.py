@@ -0,0 +1,38 @@
+"""expiry notifications
+
+Revision ID: 7b5d0e3c9a14
+Revises: f1d2c8b4a937
+Create Date: 2026-10-18 20:41:37.905162
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b5d0e3c9a14'
+down_revision = 'f1d2c8b4a937'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('expiry_notification',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('inventory_id', sa.Integer(), nullable=False),
+    sa.Column('ingredient_id', sa.Integer(), nullable=False),
+    sa.Column('expiry_date', sa.Date(), nullable=False),
+    sa.Column('notified_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['inventory_id'], ['user_inventory.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('inventory_id')
+    )
+    with op.batch_alter_table('user_inventory', schema=None) as batch_op:
+        batch_op.create_index('ix_user_inventory_expiry', ['expiry_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user_inventory', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_inventory_expiry')
+
+    op.drop_table('expiry_notification')
@@ -0,0 +1,26 @@
+"""user inventory version
+
+Revision ID: 8c1d5e7a9f20
+Revises: 3f6a2c91b7d4
+Create Date: 2026-10-18 13:40:51.207715
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c1d5e7a9f20'
+down_revision = '3f6a2c91b7d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('inventory_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('inventory_version')
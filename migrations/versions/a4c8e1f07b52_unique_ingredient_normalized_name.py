@@ -0,0 +1,72 @@
+"""unique ingredient normalized name
+
+Revision ID: a4c8e1f07b52
+Revises: 5e2f9c4d8a13
+Create Date: 2026-10-18 17:22:40.611954
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c8e1f07b52'
+down_revision = '5e2f9c4d8a13'
+branch_labels = None
+depends_on = None
+
+
+def _merge_duplicates(bind):
+    """Fold ingredients sharing a normalized name into the oldest one, moving their references."""
+    groups = bind.execute(sa.text(
+        "SELECT normalized_name, min(id) FROM ingredient GROUP BY normalized_name HAVING count(*) > 1"
+    )).all()
+    for normalized_name, keep_id in groups:
+        dup_ids = [row[0] for row in bind.execute(
+            sa.text("SELECT id FROM ingredient WHERE normalized_name = :n AND id != :keep"),
+            {'n': normalized_name, 'keep': keep_id},
+        )]
+        for dup_id in dup_ids:
+            params = {'keep': keep_id, 'dup': dup_id}
+            bind.execute(sa.text("UPDATE user_inventory SET ingredient_id = :keep WHERE ingredient_id = :dup"), params)
+            # Composite keys: a list or recipe may already hold the kept ingredient
+            bind.execute(sa.text(
+                "UPDATE shopping_list_item SET quantity = quantity + coalesce(("
+                " SELECT d.quantity FROM shopping_list_item d"
+                " WHERE d.shopping_list_id = shopping_list_item.shopping_list_id AND d.ingredient_id = :dup), 0)"
+                " WHERE ingredient_id = :keep"
+            ), params)
+            bind.execute(sa.text(
+                "DELETE FROM shopping_list_item WHERE ingredient_id = :dup AND shopping_list_id IN ("
+                " SELECT shopping_list_id FROM shopping_list_item WHERE ingredient_id = :keep)"
+            ), params)
+            bind.execute(sa.text("UPDATE shopping_list_item SET ingredient_id = :keep WHERE ingredient_id = :dup"), params)
+            bind.execute(sa.text(
+                "DELETE FROM recipe_ingredient WHERE ingredient_id = :dup AND recipe_id IN ("
+                " SELECT recipe_id FROM recipe_ingredient WHERE ingredient_id = :keep)"
+            ), params)
+            bind.execute(sa.text("UPDATE recipe_ingredient SET ingredient_id = :keep WHERE ingredient_id = :dup"), params)
+            bind.execute(sa.text("DELETE FROM ingredient WHERE id = :dup"), params)
+
+
+def upgrade():
+    bind = op.get_bind()
+    # Rows created since the previous migration by code that did not set the column
+    rows = bind.execute(sa.text("SELECT id, name FROM ingredient WHERE normalized_name IS NULL")).all()
+    for row in rows:
+        bind.execute(sa.text("UPDATE ingredient SET normalized_name = :n WHERE id = :id"),
+                     {'n': ' '.join(row.name.lower().split()), 'id': row.id})
+    _merge_duplicates(bind)
+    bind.execute(sa.text("UPDATE catalog_version SET version = version + 1"))
+
+    with op.batch_alter_table('ingredient', schema=None) as batch_op:
+        batch_op.drop_index('ix_ingredient_normalized_name')
+        batch_op.alter_column('normalized_name', existing_type=sa.String(length=100), nullable=False)
+        batch_op.create_index(batch_op.f('ix_ingredient_normalized_name'), ['normalized_name'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('ingredient', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ingredient_normalized_name'))
+        batch_op.alter_column('normalized_name', existing_type=sa.String(length=100), nullable=True)
+        batch_op.create_index(batch_op.f('ix_ingredient_normalized_name'), ['normalized_name'], unique=False)
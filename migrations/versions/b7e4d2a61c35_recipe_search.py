@@ -0,0 +1,52 @@
+"""recipe search index and filter indexes
+
+Revision ID: b7e4d2a61c35
+Revises: 8c1d5e7a9f20
+Create Date: 2026-10-18 16:05:37.842190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e4d2a61c35'
+down_revision = '8c1d5e7a9f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('recipe', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_recipe_difficulty'), ['difficulty'], unique=False)
+        batch_op.create_index(batch_op.f('ix_recipe_diet_id'), ['diet_id'], unique=False)
+    op.create_index('ix_recipe_total_time', 'recipe',
+                    [sa.text('(coalesce(prep_time, 0) + coalesce(cook_time, 0))')], unique=False)
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        # Same statements as app.utils.recipe_search.ensure_search_index; filled from existing recipes
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS recipe_fts "
+            "USING fts5(name, description, cuisine, ingredients, tokenize='unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            """
+            INSERT INTO recipe_fts (rowid, name, description, cuisine, ingredients)
+            SELECT r.id, r.name, coalesce(r.description, ''), coalesce(r.cuisine, ''),
+                   coalesce((SELECT group_concat(i.name, ' ')
+                             FROM recipe_ingredient ri JOIN ingredient i ON i.id = ri.ingredient_id
+                             WHERE ri.recipe_id = r.id), '')
+            FROM recipe r
+            """
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS recipe_fts')
+    op.drop_index('ix_recipe_total_time', table_name='recipe')
+    with op.batch_alter_table('recipe', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_recipe_diet_id'))
+        batch_op.drop_index(batch_op.f('ix_recipe_difficulty'))
@@ -0,0 +1,32 @@
+"""recipe source id
+
+Revision ID: c9a3f4e6b218
+Revises: e3b71f5a2c86
+Create Date: 2026-10-18 18:31:05.128374
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9a3f4e6b218'
+down_revision = 'e3b71f5a2c86'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('recipe', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('source_id', sa.String(length=100), nullable=True))
+        batch_op.create_index(batch_op.f('ix_recipe_source_id'), ['source_id'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('recipe', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_recipe_source_id'))
+        batch_op.drop_column('source_id')
+    if op.get_bind().dialect.name == 'sqlite':
+        # The batch rebuild of the table does not carry over expression indexes (see b7e4d2a61c35)
+        op.create_index('ix_recipe_total_time', 'recipe',
+                        [sa.text('(coalesce(prep_time, 0) + coalesce(cook_time, 0))')], unique=False)
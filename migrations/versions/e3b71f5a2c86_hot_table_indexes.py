@@ -0,0 +1,40 @@
+"""composite indexes for per-user tables
+
+Revision ID: e3b71f5a2c86
+Revises: a4c8e1f07b52
+Create Date: 2026-10-18 18:02:19.447381
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3b71f5a2c86'
+down_revision = 'a4c8e1f07b52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user_inventory', schema=None) as batch_op:
+        batch_op.create_index('ix_user_inventory_user_ingredient_expiry', ['user_id', 'ingredient_id', 'expiry_date'], unique=False)
+
+    with op.batch_alter_table('shopping_list', schema=None) as batch_op:
+        batch_op.create_index('ix_shopping_list_user_created', ['user_id', 'created_at'], unique=False)
+        batch_op.create_index('ix_shopping_list_user_name', ['user_id', 'name'], unique=False)
+
+    with op.batch_alter_table('cooking_history', schema=None) as batch_op:
+        batch_op.create_index('ix_cooking_history_user_date', ['user_id', 'cooking_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('cooking_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_cooking_history_user_date')
+
+    with op.batch_alter_table('shopping_list', schema=None) as batch_op:
+        batch_op.drop_index('ix_shopping_list_user_name')
+        batch_op.drop_index('ix_shopping_list_user_created')
+
+    with op.batch_alter_table('user_inventory', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_inventory_user_ingredient_expiry')
@@ -0,0 +1,30 @@
+"""recipe content hash
+
+Revision ID: f1d2c8b4a937
+Revises: c9a3f4e6b218
+Create Date: 2026-10-18 19:04:51.302617
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1d2c8b4a937'
+down_revision = 'c9a3f4e6b218'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('recipe', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('recipe', schema=None) as batch_op:
+        batch_op.drop_column('content_hash')
+    if op.get_bind().dialect.name == 'sqlite':
+        # The batch rebuild of the table does not carry over expression indexes (see b7e4d2a61c35)
+        op.create_index('ix_recipe_total_time', 'recipe',
+                        [sa.text('(coalesce(prep_time, 0) + coalesce(cook_time, 0))')], unique=False)
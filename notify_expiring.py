@@ -0,0 +1,33 @@
+"""Send every user one digest of their pantry items about to expire; meant to run daily from cron.
+
+Only lots that are new to the window, or whose expiry date changed since
+they were last alerted, are included, so re-running the same day sends nothing.
+
+    python notify_expiring.py                     # EXPIRY_NOTIFIER, 'file' by default
+    python notify_expiring.py --notifier smtp --days 5
+    python notify_expiring.py --dry-run           # print the digests, record nothing
+"""
+import argparse
+import os
+
+from app import create_app
+from app.utils.expiry_notifications import NOTIFIERS, PrintNotifier, create_notifier, notify_expiring
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--notifier', choices=NOTIFIERS, help='overrides EXPIRY_NOTIFIER')
+    parser.add_argument('--days', type=int, help='alert lots expiring within this many days (EXPIRY_NOTIFY_DAYS)')
+    parser.add_argument('--batch-size', type=int, default=500, help='users between progress commits')
+    parser.add_argument('--dry-run', action='store_true', help='print the digests instead of sending them')
+    args = parser.parse_args()
+
+    app = create_app(os.getenv('FLASK_ENV') or 'default')
+    with app.app_context():
+        notifier = PrintNotifier() if args.dry_run else create_notifier(app.config, args.notifier)
+        stats = notify_expiring(notifier, days=args.days, batch_size=args.batch_size, record=not args.dry_run)
+    print(stats)
+
+
+if __name__ == '__main__':
+    main()
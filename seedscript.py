@@ -1,6 +1,8 @@
-﻿from app import create_app, db
-from app.models import Recipe, RecipeIngredient, Ingredient, DietaryStuff, UnitEnum
-from datetime import datetime
+﻿import re
+
+from app import create_app, db
+from app.models import DietaryStuff
+from app.utils.recipe_importer import sync_recipes
 
 app = create_app()
 
@@ -88,6 +90,23 @@ RECIPES = [
 ]
 
 
+# Source ids of seeded recipes; the sync only ever deletes recipes under this prefix
+SEED_PREFIX = "seed:"
+
+
+def seed_records():
+    """RECIPES as importer records, keyed by a source id derived from the name."""
+    for data in RECIPES:
+        yield {
+            **{key: value for key, value in data.items() if key != "ingredients"},
+            "id": SEED_PREFIX + re.sub(r"[^a-z0-9]+", "-", data["name"].lower()).strip("-"),
+            "ingredients": [
+                {"name": name, "quantity": qty, "unit": unit_str.lower()}
+                for (name, qty, unit_str) in data["ingredients"]
+            ],
+        }
+
+
 def seed_recipes():
     with app.app_context():
         # --- diéták ---
@@ -98,52 +117,9 @@ def seed_recipes():
             print("🌿 Seeded DietaryStuff table.")
 
         # --- receptek ---
-        if Recipe.query.count() > 0:
-            print("ℹ️ Recipes already exist, skipping seeding.")
-            return
-
-        for data in RECIPES:
-            diet = DietaryStuff.query.filter_by(diet_name=data["diet"]).first()
-
-            recipe = Recipe(
-                name=data["name"],
-                description=data["description"],
-                servings=data["servings"],
-                prep_time=data["prep_time"],
-                cook_time=data["cook_time"],
-                difficulty=data["difficulty"],
-                cuisine=data["cuisine"],
-                diet_id=diet.id if diet else None,
-                instructions=data["instructions"],
-                nutrition=data["nutrition"],
-                created_at=datetime.utcnow()
-            )
-            db.session.add(recipe)
-            db.session.flush()
-
-            # --- hozzávalók ---
-            for (name, qty, unit_str) in data["ingredients"]:
-                # 1️⃣ konvertáljuk string → UnitEnum
-                try:
-                    unit_enum = UnitEnum(unit_str.lower())
-                except ValueError:
-                    print(f"⚠️ Warning: '{unit_str}' not in UnitEnum. Skipping ingredient {name}.")
-                    continue
-
-                ingredient = Ingredient.query.filter_by(name=name).first()
-                if not ingredient:
-                    ingredient = Ingredient(name=name, unit=unit_enum)
-                    db.session.add(ingredient)
-                    db.session.flush()
-
-                db.session.add(RecipeIngredient(
-                    recipe_id=recipe.id,
-                    ingredient_id=ingredient.id,
-                    quantity=qty,
-                    unit=unit_enum.value
-                ))
-
-        db.session.commit()
+        # Delta sync: only changed recipes are written, removed ones are deleted
+        stats = sync_recipes(seed_records(), delete_missing=SEED_PREFIX)
+        print(f"🔄 {stats}")
         print("✅ Seeded recipes successfully.")
 
 